@@ -0,0 +1,77 @@
+import json
+import os
+import re
+from datetime import datetime, timezone
+
+# Persistent store of the bills parsed by spider-private-bills.py, keyed by ParlInfo bill id (e.g. 'r6519'),
+# merged into on each run, so incremental crawls only fetch bills that are new or may still change.
+# Stored as JSON, written atomically when the spider closes.
+
+BILL_ID_RE = re.compile(r'billhome(?:%2F|/)(\w+)', re.IGNORECASE)
+
+# statuses of bills whose progress can still change
+OPEN_STATUSES = ['Before Parliament']
+
+
+def bill_id(url):
+    m = BILL_ID_RE.search(url)
+    return m.group(1) if m else None
+
+
+# a bill without a status (e.g. not parsed from its page) is treated as open, so it is fetched again
+def is_open(bill):
+    return bill.get('status') is None or bill['status'] in OPEN_STATUSES
+
+
+def utc_now():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+class BillsStore:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        return entry and entry['bill']
+
+    # whether the bill is stored with a final status, so needn't be fetched again
+    def is_final(self, key):
+        bill = self.get(key)
+        return bill is not None and not is_open(bill)
+
+    # URLs of stored bills that are still open
+    def open_urls(self):
+        return [entry['url'] for entry in self.entries.values() if is_open(entry['bill'])]
+
+    # Stores the bill; returns whether it is new or changed.
+    def put(self, key, url, bill):
+        entry = self.entries.get(key)
+        changed = entry is None or entry['bill'] != bill
+        now = utc_now()
+        self.entries[key] = {
+            'url': url,
+            'bill': bill,
+            'fetchedAt': now,
+            'changedAt': now if changed else entry['changedAt'],
+        }
+        return changed
+
+    def bills(self):
+        return [entry['bill'] for entry in self.entries.values()]
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(self.path + '.tmp', self.path)
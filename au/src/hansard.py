@@ -0,0 +1,114 @@
+import os
+import sys
+
+from lxml import etree
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.extract import text
+
+# Streaming parser for APH Hansard sitting day XML (toc_unixml). Makes a single pass over the document,
+# yielding items as each speech ends and then discarding it (and whatever preceded it), so memory stays
+# bounded regardless of document size.
+#
+# Yields the same items spider-current.py always has: a 'session' item from the session.header,
+# then a 'talker' and a 'speech' item for each speech, with the titles of its enclosing
+# debate and sub-debates (debate, subdebate.1, subdebate.2, ...) in debateTitles.
+# Text is extracted with common/extract.py, as in the other spiders (so &nbsp; becomes a plain space).
+# Talker and speech items also carry the session's chamber, so both chambers' items for a date can be told apart.
+
+DEBATE_TAGS = ['debate'] + [f'subdebate.{n}' for n in range(1, 10)]
+DEBATE_INFO_TAGS = {'debateinfo', 'subdebateinfo'}
+EVENT_TAGS = DEBATE_TAGS + ['session.header', 'title', 'speech']
+
+
+def first(els):
+    return els[0] if len(els) > 0 else None
+
+
+def parse_session_header(header, source_url=None):
+    return {
+        'type': 'session',
+        'sourceUrl': source_url,
+        'date': text(header.find('date')),
+        'parliamentNum': text(header.find('parliament.no')),
+        'periodNum': text(header.find('period.no')),
+        'chamber': text(header.find('chamber')),
+        'proof': text(header.find('proof')),
+    }
+
+
+def parse_speech(speech, date, chamber, debate_titles):
+    talker = speech.find('.//talker')
+    if talker is None:
+        talker = etree.Element('talker')
+    talker_id = text(talker.find('name.id'))
+
+    timestamp = text(talker.find('time.stamp'))
+    if timestamp == '':
+        timestamp = None
+
+    yield {
+        'type': 'talker',
+        'talkerId': talker_id,
+        'date': date,
+        'chamber': chamber,
+        'timestamp': timestamp,
+        'name': text(talker.find('name[@role="metadata"]')),
+        'displayName': text(talker.find('name[@role="display"]')),
+        'electorate': text(talker.find('electorate')),
+        'party': text(talker.find('party')),
+    }
+
+    time = text(first(speech.xpath('.//*[@class="HPS-Time"]')))
+    if time == '':
+        time = None
+
+    paragraphs = speech.xpath('.//talk.text//p')
+    if len(paragraphs) == 0:
+        paragraphs = speech.xpath('.//para')
+    speech_text = '\n\n'.join([text(p) for p in paragraphs])
+
+    yield {
+        'type': 'speech',
+        'talkerId': talker_id,
+        'date': date,
+        'chamber': chamber,
+        'time': time,
+        'debateTitles': '||'.join(t for t in debate_titles if t is not None),
+        'text': speech_text,
+    }
+
+
+# Frees an element once its items have been yielded, along with any earlier siblings
+# (already processed, or not of interest), so the partial tree never grows.
+def release(el):
+    el.clear(keep_tail=True)
+    parent = el.getparent()
+    if parent is not None:
+        while el.getprevious() is not None:
+            del parent[0]
+
+
+# Yields the items in a sitting day's XML, read incrementally from `source` (a file name or file-like object).
+# The session item comes first, so a consumer that stops after it avoids parsing the rest.
+def parse_hansard(source, source_url=None):
+    titles = []  # title of each enclosing debate / sub-debate, outermost first
+    date = chamber = None
+    for event, el in etree.iterparse(source, events=('start', 'end'), tag=EVENT_TAGS, remove_comments=True):
+        if event == 'start':
+            if el.tag in DEBATE_TAGS:
+                titles.append(None)
+        elif el.tag == 'session.header':
+            session = parse_session_header(el, source_url)
+            date, chamber = session['date'], session['chamber']
+            yield session
+            release(el)
+        elif el.tag == 'title':
+            if titles and titles[-1] is None and el.getparent().tag in DEBATE_INFO_TAGS:
+                titles[-1] = text(el)
+        elif el.tag == 'speech':
+            yield from parse_speech(el, date, chamber, titles)
+            release(el)
+        else:
+            titles.pop()
+            release(el)
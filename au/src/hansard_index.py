@@ -0,0 +1,300 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+
+from scrapy.exceptions import NotConfigured
+
+# Local SQLite index of the Hansard items emitted by spider-current.py (see hansard.py), for querying speeches
+# by date, talker and debate title, and full-text search (FTS5) over their text and debate titles.
+#
+# Tables:
+#   sessions   one row per sitting day and chamber
+#   talkers    the talker details of each talker on each sitting day, in each chamber
+#   speeches   one row per speech, indexed by (date, chamber) and by (talkerId, date), with an external-content FTS5 table, speeches_fts
+#
+# During a crawl, HansardIndexPipeline collects items and inserts them in batches of HANSARD_INDEX_BATCH_SIZE,
+# one transaction per batch. Enable it with `scrapy runspider spider-current.py -s HANSARD_INDEX=../data/hansard.sqlite`
+# (`make hansard-index`), or index an existing feed with `python hansard_index.py load current.jl`.
+# A session item replaces the talkers and speeches of any earlier version of that sitting day and chamber (e.g. the proof,
+# once the official Hansard is published), so re-crawling or re-loading sitting days doesn't duplicate their speeches.
+#
+# Querying, e.g.:
+#   python hansard_index.py search 'climate NEAR(emissions target)' --talker 10000 --from 2022-01-01
+#   python hansard_index.py search --debate 'Matters of Public Importance' --limit 100
+
+DEFAULT_INDEX_FILE = '../data/hansard.sqlite'
+DEFAULT_BATCH_SIZE = 1000
+# stored in PRAGMA user_version; 1 added the chamber of talkers and speeches
+SCHEMA_VERSION = 1
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sessions (
+    date TEXT NOT NULL, chamber TEXT NOT NULL, parliament_num TEXT, period_num TEXT, proof TEXT, source_url TEXT,
+    PRIMARY KEY (date, chamber));
+CREATE TABLE IF NOT EXISTS talkers (
+    talker_id TEXT NOT NULL, date TEXT NOT NULL, chamber TEXT, name TEXT, display_name TEXT, electorate TEXT, party TEXT,
+    PRIMARY KEY (talker_id, date, chamber));
+CREATE TABLE IF NOT EXISTS speeches (
+    id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE,
+    date TEXT, chamber TEXT, time TEXT, talker_id TEXT, debate_titles TEXT, text TEXT);
+CREATE INDEX IF NOT EXISTS speeches_date_chamber ON speeches (date, chamber);
+CREATE INDEX IF NOT EXISTS speeches_talker_date ON speeches (talker_id, date);
+CREATE INDEX IF NOT EXISTS speeches_debate_titles ON speeches (debate_titles);
+CREATE VIRTUAL TABLE IF NOT EXISTS speeches_fts USING fts5 (
+    text, debate_titles, content='speeches', content_rowid='id', tokenize='porter unicode61');
+'''
+
+SPEECH_FIELDS = ['date', 'chamber', 'time', 'talkerId', 'debateTitles', 'text']
+
+
+def speech_key(item):
+    return hashlib.sha1(json.dumps([item.get(f) for f in SPEECH_FIELDS]).encode('utf8')).hexdigest()
+
+
+# FTS5 phrase query for the given text
+def phrase(s):
+    return '"' + s.replace('"', '""') + '"'
+
+
+class HansardIndex:
+    def __init__(self, path=DEFAULT_INDEX_FILE):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        version = self.db.execute('PRAGMA user_version').fetchone()[0]
+        if version < SCHEMA_VERSION and self.db.execute("SELECT 1 FROM sqlite_master WHERE name = 'speeches'").fetchone():
+            self.db.close()
+            raise ValueError(f"{path} was created without chambers: delete it, and re-crawl or re-load the feeds")
+        self.db.executescript(SCHEMA)
+        self.db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self.db.commit()
+        # chamber of the last session item for each date, for talker and speech items from feeds written before
+        # they had their own
+        self.chambers = {}
+
+    def close(self):
+        self.db.close()
+
+    # Inserts a batch of items in one transaction, in order: a session item replaces any earlier version of its sitting day
+    # and chamber, and the talker and speech items after it are added to it. Returns the number of speeches added.
+    def add(self, items):
+        added = 0
+        talkers, speeches = [], []
+        with self.db:
+            for item in items:
+                if item['type'] == 'session':
+                    added += self.insert(talkers, speeches)
+                    talkers, speeches = [], []
+                    self.replace_session(item)
+                    continue
+                if item['type'] not in ['talker', 'speech']:
+                    continue
+                if 'chamber' not in item:
+                    item = dict(item, chamber=self.chambers.get(item['date']))
+                if item['type'] == 'talker':
+                    if item.get('talkerId'):
+                        talkers.append((item['talkerId'], item['date'], item['chamber'], item.get('name'),
+                                        item.get('displayName'), item.get('electorate'), item.get('party')))
+                else:
+                    speeches.append((speech_key(item), item['date'], item['chamber'], item.get('time'), item.get('talkerId'),
+                                     item.get('debateTitles'), item.get('text')))
+            added += self.insert(talkers, speeches)
+        return added
+
+    # Replaces a sitting day's session in its chamber, removing the talkers and speeches of the version indexed before
+    # (e.g. the proof, once the official Hansard is published), along with their full-text index entries.
+    def replace_session(self, item):
+        date, chamber = item['date'], item['chamber']
+        self.chambers[date] = chamber
+        self.db.execute("INSERT INTO speeches_fts (speeches_fts, rowid, text, debate_titles) "
+                        "SELECT 'delete', id, text, debate_titles FROM speeches WHERE date = ? AND chamber = ?", (date, chamber))
+        self.db.execute('DELETE FROM speeches WHERE date = ? AND chamber = ?', (date, chamber))
+        self.db.execute('DELETE FROM talkers WHERE date = ? AND chamber = ?', (date, chamber))
+        self.db.execute('INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?)',
+                        (date, chamber, item.get('parliamentNum'), item.get('periodNum'), item.get('proof'), item.get('sourceUrl')))
+
+    # Inserts talker and speech rows (within add's transaction); returns the number of speeches added.
+    def insert(self, talkers, speeches):
+        self.db.executemany('INSERT OR REPLACE INTO talkers VALUES (?, ?, ?, ?, ?, ?, ?)', talkers)
+        last_id = self.db.execute('SELECT MAX(id) FROM speeches').fetchone()[0] or 0
+        before = self.db.total_changes
+        self.db.executemany('INSERT OR IGNORE INTO speeches (key, date, chamber, time, talker_id, debate_titles, text) '
+                            'VALUES (?, ?, ?, ?, ?, ?, ?)', speeches)
+        added = self.db.total_changes - before
+        if added:
+            # index the rows just inserted (new ids are greater than any existing one)
+            self.db.execute('INSERT INTO speeches_fts (rowid, text, debate_titles) '
+                            'SELECT id, text, debate_titles FROM speeches WHERE id > ?', (last_id,))
+        return added
+
+    # Merges the FTS index segments written by the batches, for faster queries.
+    def optimize(self):
+        with self.db:
+            self.db.execute("INSERT INTO speeches_fts (speeches_fts) VALUES ('optimize')")
+
+    # Rebuilds the FTS index from the speeches table.
+    def rebuild(self):
+        with self.db:
+            self.db.execute("INSERT INTO speeches_fts (speeches_fts) VALUES ('rebuild')")
+
+    def counts(self):
+        return {table: self.db.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                for table in ['sessions', 'talkers', 'speeches']}
+
+    # Speeches matching all the given criteria, as dicts: `query` is an FTS5 query over text and debate titles
+    # (best matches first, with a snippet of the text), `debate` a phrase in the debate titles;
+    # without a query, the most recent first.
+    def search(self, query=None, talker_id=None, date_from=None, date_to=None, debate=None, limit=20, offset=0):
+        matches = [m for m in [query and f'({query})', debate and f'debate_titles : {phrase(debate)}'] if m]
+        where, params = [], []
+        if matches:
+            where.append('speeches_fts MATCH ?')
+            params.append(' AND '.join(matches))
+        if talker_id:
+            where.append('s.talker_id = ?')
+            params.append(str(talker_id))
+        if date_from:
+            where.append('s.date >= ?')
+            params.append(date_from)
+        if date_to:
+            where.append('s.date <= ?')
+            params.append(date_to)
+
+        if matches:
+            sql = ("SELECT s.*, t.display_name, t.party, snippet(speeches_fts, 0, '[', ']', '...', 24) AS snippet "
+                   "FROM speeches_fts JOIN speeches s ON s.id = speeches_fts.rowid ")
+            order = 'ORDER BY bm25(speeches_fts)'
+        else:
+            sql = "SELECT s.*, t.display_name, t.party, substr(s.text, 1, 200) AS snippet FROM speeches s "
+            order = 'ORDER BY s.date DESC, s.time DESC'
+        sql += 'LEFT JOIN talkers t ON t.talker_id = s.talker_id AND t.date = s.date AND t.chamber IS s.chamber '
+        if where:
+            sql += 'WHERE ' + ' AND '.join(where) + ' '
+        sql += order + ' LIMIT ? OFFSET ?'
+        return [dict(row) for row in self.db.execute(sql, params + [limit, offset])]
+
+    # Talker details (the most recent of each talker), optionally those whose name contains `name`
+    def talkers(self, name=None):
+        sql = ('SELECT talker_id, display_name, name, party, electorate, MAX(date) AS last_date, COUNT(DISTINCT date) AS days '
+               'FROM talkers ')
+        params = []
+        if name:
+            sql += 'WHERE name LIKE ? OR display_name LIKE ? '
+            params = [f'%{name}%'] * 2
+        sql += 'GROUP BY talker_id ORDER BY name'
+        return [dict(row) for row in self.db.execute(sql, params)]
+
+
+# Scrapy item pipeline adding the crawled items to the index, in batches.
+# Settings: HANSARD_INDEX (the SQLite file; the pipeline is disabled without it), HANSARD_INDEX_BATCH_SIZE.
+class HansardIndexPipeline:
+    def __init__(self, path, batch_size):
+        self.path = path
+        self.batch_size = batch_size
+        self.index = None
+        self.batch = []
+        self.added = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        path = crawler.settings.get('HANSARD_INDEX')
+        if not path:
+            raise NotConfigured
+        return cls(path, crawler.settings.getint('HANSARD_INDEX_BATCH_SIZE', DEFAULT_BATCH_SIZE))
+
+    def open_spider(self, spider):
+        self.index = HansardIndex(self.path)
+
+    def process_item(self, item, spider):
+        if item.get('type') in ['session', 'talker', 'speech']:
+            self.batch.append(dict(item))
+            if len(self.batch) >= self.batch_size:
+                self.flush()
+        return item
+
+    def flush(self):
+        if self.batch:
+            self.added += self.index.add(self.batch)
+            self.batch = []
+
+    def close_spider(self, spider):
+        self.flush()
+        self.index.optimize()
+        spider.logger.info("Hansard index %s: %d speeches added, %s", self.path, self.added, self.index.counts())
+        self.index.close()
+
+
+# Loads items from JSON lines feeds (e.g. current.jl) into the index.
+def load(index, paths, batch_size=DEFAULT_BATCH_SIZE):
+    added = 0
+    batch = []
+    for path in paths:
+        print("loading:", path)
+        with open(path) as f:
+            for line in f:
+                batch.append(json.loads(line))
+                if len(batch) >= batch_size:
+                    added += index.add(batch)
+                    batch = []
+    added += index.add(batch)
+    index.optimize()
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Index Hansard items from spider-current.py in SQLite, and query them.')
+    parser.add_argument('--index', default=DEFAULT_INDEX_FILE, help=f'the index file (default: {DEFAULT_INDEX_FILE})')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    load_parser = commands.add_parser('load', help='add the items in JSON lines feeds to the index')
+    load_parser.add_argument('feeds', nargs='+')
+    load_parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    search_parser = commands.add_parser('search', help='search speeches')
+    search_parser.add_argument('query', nargs='?', help='FTS5 query over speech text and debate titles')
+    search_parser.add_argument('--talker', help='talkerId')
+    search_parser.add_argument('--from', dest='date_from', help='earliest date (YYYY-MM-DD)')
+    search_parser.add_argument('--to', dest='date_to', help='latest date (YYYY-MM-DD)')
+    search_parser.add_argument('--debate', help='phrase in the debate titles')
+    search_parser.add_argument('--limit', type=int, default=20)
+    search_parser.add_argument('--json', action='store_true', help='print the matching speeches as JSON lines')
+
+    talkers_parser = commands.add_parser('talkers', help='list talkers')
+    talkers_parser.add_argument('name', nargs='?')
+
+    commands.add_parser('stats', help='count the indexed items')
+    commands.add_parser('rebuild', help='rebuild the full-text index')
+
+    args = parser.parse_args()
+    index = HansardIndex(args.index)
+    if args.command == 'load':
+        added = load(index, args.feeds, args.batch_size)
+        print(f"{added} speeches added: {index.counts()}")
+    elif args.command == 'search':
+        results = index.search(args.query, args.talker, args.date_from, args.date_to, args.debate, args.limit)
+        for r in results:
+            if args.json:
+                print(json.dumps(r))
+            else:
+                print(f"{r['date']} {r['time'] or ''} {r['talker_id']} {r['display_name'] or ''} ({r['party'] or ''})")
+                print(f"  {r['debate_titles']}")
+                print(f"  {r['snippet']}")
+        print(f"{len(results)} speeches", file=sys.stderr)
+    elif args.command == 'talkers':
+        for t in index.talkers(args.name):
+            print(f"{t['talker_id']}\t{t['display_name']}\t{t['party']}\t{t['electorate']}\t{t['last_date']}")
+    elif args.command == 'stats':
+        print(index.counts())
+    elif args.command == 'rebuild':
+        index.rebuild()
+    index.close()
+
+
+if __name__ == '__main__':
+    main()
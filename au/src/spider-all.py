@@ -1,21 +1,26 @@
+import os
 import scrapy
+import sys
 from urllib.parse import urlsplit, urlunsplit
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.crawl import crawl_settings
+from common.extract import text, texts
+from common.httpcache import DAY, cache_settings
+
 APH_URL = 'https://www.aph.gov.au'
 PARLIAMENTARIAN_URL = APH_URL + '/Senators%20and%20Members/Parliamentarian.aspx'
 PARLINFO_SEARCH_URL = 'https://parlinfo.aph.gov.au/parlInfo/guide/biography.w3p;list=3'
 
 
-def text(el, strip=True):
-    txt = el.xpath('string(.)').get()
-    if txt and strip:
-        txt = txt.strip()
-    return txt
-
 
 class Spider(scrapy.Spider):
     name = 'parlinfo'
     start_urls = [PARLINFO_SEARCH_URL]
+    custom_settings = {
+        **cache_settings([(r'/search/display/', 7 * DAY)]),
+        **crawl_settings('au-all'),
+    }
     # start_urls = [
     #     'https://www.aph.gov.au/Senators%20and%20Members/Parliamentarian.aspx?MPID=IPZ']
 
@@ -34,8 +39,8 @@ class Spider(scrapy.Spider):
         if len(sumLinkPs) >= 2:
             profile['party'] = text(sumLinkPs[1])
 
-        dts = [text(el) for el in response.css('dl dt')]
-        dds = [text(el) for el in response.css('dl dd')]
+        dts = texts(response.css('dl dt'))
+        dds = texts(response.css('dl dd'))
         for dt, dd in zip(dts, dds):
             profile[dt.lower().strip().replace(' ', '_')] = dd.strip()
 
@@ -45,9 +50,9 @@ class Spider(scrapy.Spider):
         key = 'MISSING_KEY'
         for el in response.css('.box hr ~ *').css('span,p'):
             if el.root.tag == 'span':
-                key = text(el).strip()
+                key = text(el.root)
             else:
-                value = text(el).strip()
+                value = text(el.root)
                 profile[key] = profile[key] + '||' + value if key in profile else value
 
         yield profile
@@ -1,24 +1,78 @@
-import pandas as pd
+import io
+import os
+import re
 import scrapy
-from urllib.parse import urlsplit, urlunsplit
+import sys
+from datetime import date
+from urllib.parse import quote, urlsplit, urlunsplit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.crawl import crawl_settings
+from common.dates import parse_date
+from common.extract import text, texts
+from common.httpcache import DAY, cache_settings
+from hansard import parse_hansard
 
 APH_URL = 'https://www.aph.gov.au'
 PARLIAMENTARIAN_URL = APH_URL + '/Senators%20and%20Members/Parliamentarian.aspx'
-PARLINFO_SEARCH_URL = 'https://parlinfo.aph.gov.au/parlInfo/search/summary/summary.w3p'
-
-
-def text(el, strip=True):
-    txt = el.xpath('string(.)').get()
-    if txt and strip:
-        txt = txt.strip()
-    return txt
-
-
+PARLINFO_URL = 'https://parlinfo.aph.gov.au'
+PARLINFO_SEARCH_URL = PARLINFO_URL + '/parlInfo/search/summary/summary.w3p'
+# House of Reps and Senate Hansard since 2017, oldest first
+SESSIONS_SEARCH_URL = PARLINFO_SEARCH_URL + (';adv=yes;orderBy=date-eFirst;page=0;'
+                                             'query=Dataset%3Ahansardr,hansards%20Date%3A01%2F01%2F2017%20%3E%3E%2031%2F12%2F2099;resCount=100')
+# sitting day XML, e.g. /parlInfo/download/chamber/hansardr/2021-02-04/toc_unixml/...
+SESSION_XML_RE = re.compile(r'/chamber/(hansard[rs])/(\d{4}-\d{2}-\d{2})/toc_unixml/')
+# Hansard dataset in the ParlInfo id of a search result, e.g. chamber/hansardr/24816/0003 (URL-encoded in display links)
+HANSARD_ID_RE = re.compile(r'chamber(?:/|%2F)(hansard[rs])(?:/|%2F)', re.IGNORECASE)
+# name of each dataset's sitting day XML file, e.g. reps 2021-02-04.xml
+SESSION_XML_NAMES = {'hansardr': 'reps', 'hansards': 'senate'}
+# earliest sitting day crawled
+SESSIONS_FROM = date(2017, 1, 1)
+
+
+# the date in a search result's metadata (<dt>Date</dt><dd>...</dd>)
+def result_date(result):
+    for dt, dd in zip(result.css('dt'), result.css('dd')):
+        if text(dt).rstrip(':').upper() == 'DATE':
+            return parse_date(text(dd), dayfirst=True)
+    return None
+
+
+def session_xml_url(dataset, sitting_date):
+    name = f'{SESSION_XML_NAMES[dataset]} {sitting_date}.xml'
+    return f'{PARLINFO_URL}/parlInfo/download/chamber/{dataset}/{sitting_date}/toc_unixml/{quote(name)};fileType=text%2Fxml'
+
+
+# Crawl modes (-a mode=...):
+#   members   follows each parliamentarian's speeches to the sitting days they spoke on (default)
+#   sessions  enumerates sitting days from a Hansard search instead, skipping the parliamentarian pages;
+#             speeches are attributed to talkers by the talkerId in each sitting day's XML
+# Either way, each sitting day's XML is fetched and parsed once, however many members spoke that day.
 class Spider(scrapy.Spider):
     name = 'parlinfo'
     start_urls = [PARLINFO_SEARCH_URL + ';adv=yes;orderBy=alphaAss;page=0;query=Dataset%3Amembers;resCount=200']
     # start_urls = ['https://www.aph.gov.au/Senators%20and%20Members/Parliamentarian.aspx?MPID=A9B']
     # start_urls = ['https://parlinfo.aph.gov.au/parlInfo/download/chamber/hansardr/1998-03-02/toc_unixml/reps%201998-03-02.xml;fileType=text%2Fxml']
+    custom_settings = {
+        # sitting day XML only changes when the proof is replaced by the official Hansard
+        **cache_settings([(r'/toc_unixml/', 30 * DAY)]),
+        **crawl_settings('au-current'),
+        # adds the items to a local SQLite index if HANSARD_INDEX is set (see hansard_index.py)
+        'ITEM_PIPELINES': {'hansard_index.HansardIndexPipeline': 300},
+    }
+
+    def __init__(self, mode='members', *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if mode not in ['members', 'sessions']:
+            raise ValueError(f"Unknown mode: {mode}")
+        self.mode = mode
+        self.sessions_seen = set()
+
+    def start_requests(self):
+        if self.mode == 'sessions':
+            yield scrapy.Request(SESSIONS_SEARCH_URL, self.parse_sessions)
+        else:
+            yield from super().start_requests()
 
     def parse(self, response):
         yield from self.parse_parliamentarians(response)
@@ -46,7 +100,7 @@ class Spider(scrapy.Spider):
         if len(dls) > 0:
             bio_dl = dls[0]
             biography = {
-                text(dt): [text(li) for li in dd.css('li')] for dt, dd in zip(bio_dl.css('dt'), bio_dl.css('dd'))
+                text(dt): texts(dd.css('li')) for dt, dd in zip(bio_dl.css('dt'), bio_dl.css('dd'))
             }
 
         # speeches = []
@@ -67,92 +121,71 @@ class Spider(scrapy.Spider):
         for li in response.css('ul.search-filter-results li'):
             dts = li.css('dt::text').getall()
             dds = li.css('dd::text').getall()
-            date = None
+            sitting_date = None
             for dt, dd in zip(dts, dds):
                 if dt.upper() == 'DATE':
-                    date = pd.to_datetime(dd)
-            self.logger.info("speech li date: %s", date)
-            if date < pd.Timestamp(2017, 1, 1):
+                    sitting_date = parse_date(dd, dayfirst=True)
+            self.logger.info("speech li date: %s", sitting_date)
+            if sitting_date is not None and sitting_date < SESSIONS_FROM:
                 self.logger.warn("Skipping speech prior to 2017-01-01")
                 continue
 
             for href in li.css('a[title="XML format"]::attr(href)'):
-                self.logger.info("Following speeches XML format anchor: %s", href.get())
-                yield response.follow(href, self.parse_session_xml)
+                yield from self.follow_session_xml(response, href.get())
 
-        pg = response.css('.results-pagination')[0]
-        for href in pg.css('li.next a::attr(href)'):
+        # a single page of results has no pagination
+        pg = response.css('.results-pagination')
+        if not pg:
+            return
+        for href in pg[0].css('li.next a::attr(href)'):
             self.logger.info("Following next speeches URL for anchor: %s", href.get())
             yield response.follow(href, self.parse_speeches)
 
 
-    def parse_session_xml(self, response):
-        self.logger.info("download_session_xml: parsing session XML at: %s", response.url)
-        session_header = response.css('session\\.header')[0]
-        date = text(session_header.css('date'))
+    # Hansard search results (ParlInfo summary pages) in sessions mode: one result per debate or speech, each linking
+    # to its display page, with its date in the result's metadata. The sitting day's XML URL is derived from the
+    # dataset (hansardr, hansards) in the link and the date, so each day is requested once, however many results it has.
+    def parse_sessions(self, response):
+        self.logger.info("parse_sessions: parsing Hansard search results at: %s", response.url)
+        for result in response.css('.result'):
+            hrefs = [response.urljoin(href) for href in result.css('a::attr(href)').getall()]
+            xml_urls = [url for url in hrefs if SESSION_XML_RE.search(url)]
+            if xml_urls:
+                yield from self.follow_session_xml(response, xml_urls[0])
+                continue
 
-        if pd.to_datetime(date) < pd.Timestamp(2017, 1, 1):
-            self.logger.warn("Skipping session prior to 2017-01-01: %s", date)
+            datasets = [m.group(1).lower() for m in map(HANSARD_ID_RE.search, hrefs) if m]
+            sitting_date = result_date(result)
+            if not datasets or sitting_date is None:
+                self.logger.warn("No Hansard dataset or date in search result: %s", hrefs[:1])
+                continue
+            if sitting_date < SESSIONS_FROM:
+                self.logger.warn("Skipping sitting day prior to 2017-01-01: %s", sitting_date)
+                continue
+            yield from self.follow_session_xml(response, session_xml_url(datasets[0], sitting_date.isoformat()))
+
+        # the navigation is repeated above and below the results
+        for a in response.css('.resultsNav a'):
+            if a.css('img').attrib.get('alt') == 'Next Page':
+                yield response.follow(a, self.parse_sessions)
+                break
+
+    # Follows a sitting day's XML unless already requested, whichever result (member, debate) links to it.
+    def follow_session_xml(self, response, href):
+        url = response.urljoin(href)
+        match = SESSION_XML_RE.search(url)
+        key = match.groups() if match else url.split(';')[0]
+        if key in self.sessions_seen:
+            self.logger.debug("Already following session XML: %s", url)
             return
+        self.sessions_seen.add(key)
+        self.logger.info("Following speeches XML format anchor: %s", url)
+        yield scrapy.Request(url, self.parse_session_xml)
 
-        yield {
-            'type': 'session', 
-            'sourceUrl': response.url,
-            'date': date,
-            'parliamentNum': text(session_header.css('parliament\\.no')),
-            'periodNum': text(session_header.css('period\\.no')),
-            'chamber': text(session_header.css('chamber')),
-            'proof': text(session_header.css('proof')),
-        }
-
-        for debate in response.css('debate'):
-            title1 = text(debate.css('debateinfo title'))
-            for speech in debate.css('speech'):
-                yield from self.parse_speech(speech, date, [title1])
-
-            for subdebate1 in debate.css('subdebate\\.1'):
-                title2 = text(subdebate1.css('subdebateinfo title'))
-                for speech in subdebate1.css('speech'):
-                    yield from self.parse_speech(speech, date, [title1, title2])
-
-                for subdebate2 in subdebate1.css('subdebate\\.2'):
-                    title3 = text(subdebate2.css('subdebateinfo title'))
-                    for speech in subdebate2.css('speech'):
-                        yield from self.parse_speech(speech, date, [title1, title2, title3])
-
-    def parse_speech(self, speech, date, debateTitles):
-        talkerId = text(speech.css('talker name\\.id'))
-
-        timestamp = text(speech.css('talker time\\.stamp'))
-        if timestamp == '':
-            timestamp = None
-
-        talker = {
-            'type': 'talker',
-            'talkerId': talkerId,
-            'date': date,
-            'timestamp': timestamp,
-            'name': text(speech.css('talker name[role="metadata"]')),
-            'displayName': text(speech.css('talker name[role="display"]')),
-            'electorate': text(speech.css('talker electorate')),
-            'party': text(speech.css('talker party')),
-        }
-        yield talker
-        
-        time = text(speech.css('.HPS-Time'))
-        if time == '':
-            time = None
-
-        paragraphs = speech.css('talk\\.text p')
-        if len(paragraphs) == 0:
-            paragraphs = speech.css('para')
-        speech_text = '\n\n'.join([text(p) for p in paragraphs])
-
-        yield {
-            'type': 'speech',
-            'talkerId': talkerId,
-            'date': date,
-            'time': time,
-            'debateTitles': '||'.join(debateTitles),
-            'text': speech_text,
-        }
+    def parse_session_xml(self, response):
+        self.logger.info("download_session_xml: parsing session XML at: %s", response.url)
+        for item in parse_hansard(io.BytesIO(response.body), response.url):
+            if item['type'] == 'session' and (parse_date(item['date']) or SESSIONS_FROM) < SESSIONS_FROM:
+                self.logger.warn("Skipping session prior to 2017-01-01: %s", item['date'])
+                return
+            yield item
@@ -1,28 +1,67 @@
-import pandas as pd
+import os
 import scrapy
+import sys
 from urllib.parse import urlsplit, urlunsplit
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.crawl import crawl_settings
+from common.dates import iso_date
+from common.extract import table_rows, text
+from common.httpcache import cache_settings
+from bills import BillsStore, bill_id
+
 PARLINFO_SEARCH_URL = 'https://parlinfo.aph.gov.au/parlInfo/search'
 PARLINFO_PRIVATE_BILLS_SEARCH_URL = 'https://parlinfo.aph.gov.au/parlInfo/search/summary/summary.w3p;adv=yes;orderBy=date-eFirst;page=0;query=Dataset%3AbillsCurBef,billsCurNotBef,billsPrevParl%20Dataset_Phrase%3A%22billhome%22%20BillType_Phrase%3A%22private%22;resCount=200'
+# newest first, for incremental crawls
+PARLINFO_PRIVATE_BILLS_LATEST_URL = PARLINFO_PRIVATE_BILLS_SEARCH_URL.replace('orderBy=date-eFirst', 'orderBy=date-eLast')
 PARLINFO_PRIVATE_BILL_EXAMPLE_URL = 'https://parlinfo.aph.gov.au/parlInfo/search/display/display.w3p;adv=yes;orderBy=date-eFirst;page=0;query=Dataset%3AbillsCurBef,billsCurNotBef,billsPrevParl%20Dataset_Phrase%3A%22billhome%22%20BillType_Phrase%3A%22private%22;rec=0;resCount=Default'
-
-def text(el, strip=True):
-    txt = el.xpath('string(.)').get()
-    if txt and strip:
-        txt = txt.strip()
-    return txt
+BILLS_STORE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'private-bills.json')
 
 
+# Parsed bills are merged into a persistent store (-a store=PATH, default au/data/private-bills.json).
+# With -a incremental=1, search results are read newest first, and paging stops at the first page whose bills are all
+# already stored with a final status; stored bills that are still before Parliament are re-fetched directly.
+# Only the bills fetched are yielded; the store has them all.
 class Spider(scrapy.Spider):
     name = 'parlinfo-private-bills'
     start_urls = [PARLINFO_PRIVATE_BILLS_SEARCH_URL]
+    custom_settings = {
+        **cache_settings(),
+        **crawl_settings('au-private-bills'),
+    }
+
+    def __init__(self, store=BILLS_STORE_FILE, incremental=False, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.store = BillsStore(store)
+        self.incremental = incremental not in [False, '0', 'false', 'no']
+
+    def start_requests(self):
+        if not self.incremental:
+            yield from super().start_requests()
+            return
+        self.logger.info("Incremental crawl: %d bills stored, %d still open", len(self.store), len(self.store.open_urls()))
+        yield scrapy.Request(PARLINFO_PRIVATE_BILLS_LATEST_URL, self.parse)
+        for url in self.store.open_urls():
+            yield scrapy.Request(url, self.parse_bill_page)
+
+    def closed(self, reason):
+        self.store.save()
 
     def parse(self, response):
         yield from self.parse_bills_search(response)
 
     def parse_bills_search(self, response):
+        new_bills = 0
         for a in response.css('.result .sumLink a'):
-            yield response.follow(a, self.parse_bill)
+            key = bill_id(response.urljoin(a.attrib['href']))
+            if self.incremental and key is not None and self.store.is_final(key):
+                continue
+            new_bills += 1
+            yield response.follow(a, self.parse_bill_page)
+
+        if self.incremental and new_bills == 0:
+            self.logger.info("Stopping at %s: all its bills are stored and final", response.url)
+            return
 
         for a in response.css('.resultsNav a'):
             alt = a.css('img').attrib.get('alt')
@@ -31,6 +70,17 @@ class Spider(scrapy.Spider):
                 # self.logger.info("Following to next page: %s", a.attrib['href'])
                 yield response.follow(a)
 
+    # parses the bill and merges it into the store
+    def parse_bill_page(self, response):
+        for bill in self.parse_bill(response):
+            key = bill_id(bill['permalink']) or bill_id(response.url)
+            if key is None:
+                self.logger.warn("No bill id in %s", bill['permalink'])
+            else:
+                changed = self.store.put(key, response.url, bill)
+                self.crawler.stats.inc_value('bills/changed' if changed else 'bills/unchanged')
+            yield bill
+
     def parse_bill(self, response):
         bill = {
             # 'url': response.url,
@@ -43,7 +93,7 @@ class Spider(scrapy.Spider):
         progress = self.parse_bill_progress(response)
         bill['progress'] = progress
         if len(progress) > 0:
-            bill['earliestDate'] = min([item['date'] for item in bill['progress']])
+            bill['earliestDate'] = min([item['date'] for item in bill['progress'] if item['date']], default=None)
 
         yield bill
 
@@ -61,15 +111,12 @@ class Spider(scrapy.Spider):
         items = []
         table = response.css('table.bills-progress')[0]
         # self.logger.info("bills-progress table: %s", table.get())
-        for tr in table.css('tr'):
-            # self.logger.info("tr attrib: %s", tr.attrib)
-            css_class = tr.attrib.get('class')
+        for css_class, cells in table_rows(table):
             if css_class == 'bills-progress-heading':
-                heading = text(tr.css('td'))
+                heading = cells[0] if cells else None
             elif css_class == 'bills-progress-item':
-                label, date, note = [text(td) for td in tr.css('td')]
-                date = date.replace('(after midnight)', '')
-                date = str(pd.to_datetime(date, dayfirst=True).date())
+                label, date, note = cells
+                date = iso_date(date, dayfirst=True)  # ignoring "(after midnight)"
                 items.append({
                     'heading': heading,
                     'label': label,
@@ -0,0 +1,26 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from bills import BillsStore
+
+# Incremental private bills crawls skip stored bills with a final status, and re-fetch the open ones;
+# a bill stored without a status is open.
+
+
+class BillsStoreTest(unittest.TestCase):
+    def test_open_and_final(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = BillsStore(os.path.join(tmp, 'private-bills.json'))
+            for key, status in [('r1', 'Act'), ('r2', 'Before Parliament'), ('r3', None)]:
+                store.put(key, f'https://example.org/{key}', {'status': status})
+            store.put('r4', 'https://example.org/r4', {})
+
+            self.assertEqual([key for key in ['r1', 'r2', 'r3', 'r4', 'r5'] if store.is_final(key)], ['r1'])
+            self.assertEqual(store.open_urls(), [f'https://example.org/{key}' for key in ['r2', 'r3', 'r4']])
+
+
+if __name__ == '__main__':
+    unittest.main()
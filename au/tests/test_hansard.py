@@ -0,0 +1,39 @@
+import io
+import os
+import sys
+import unittest
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+sys.path.insert(0, os.path.join(ROOT_DIR, 'au', 'src'))
+
+from hansard import parse_hansard
+
+# Sitting day XML text is normalised as in the other spiders (common/extract.py): &nbsp; is a plain space.
+
+with open(os.path.join(ROOT_DIR, 'bench', 'fixtures', 'hansard-reps.xml')) as f:
+    XML = f.read()
+
+
+def items(xml):
+    return list(parse_hansard(io.BytesIO(xml.encode('utf8'))))
+
+
+class ParseHansardTest(unittest.TestCase):
+    def test_nbsp(self):
+        xml = XML.replace('<name role="display">Mr SUKKAR</name>', '<name role="display">Mr&#160;SUKKAR </name>')
+        xml = xml.replace('I move: That', 'I&#160;move:&#160;That')
+        talker = next(item for item in items(xml) if item['type'] == 'talker')
+        speech = next(item for item in items(xml) if item['type'] == 'speech')
+        self.assertEqual(talker['displayName'], 'Mr SUKKAR')
+        self.assertEqual(speech['text'].split('\n\n')[0], '09:01 I move: That this bill be now read a second time.')
+
+    def test_same_items(self):
+        session, talker, speech = items(XML)[:3]
+        self.assertEqual((session['date'], session['chamber'], session['proof']), ('2021-02-04', 'House of Reps', '0'))
+        self.assertEqual((talker['talkerId'], talker['party'], talker['timestamp']), ('207346', 'LP', '09:01:00'))
+        self.assertEqual(speech['time'], '09:01')
+        self.assertEqual(speech['debateTitles'], 'BILLS||Treasury Laws Amendment (2021 Measures No. 1) Bill 2021||First Reading')
+
+
+if __name__ == '__main__':
+    unittest.main()
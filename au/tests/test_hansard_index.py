@@ -0,0 +1,68 @@
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+sys.path.insert(0, os.path.join(ROOT_DIR, 'au', 'src'))
+
+from hansard import parse_hansard
+from hansard_index import HansardIndex
+
+# A sitting day re-published as the official Hansard after its proof replaces the proof's talkers and speeches,
+# so the full-text index doesn't hold both versions of them.
+
+with open(os.path.join(ROOT_DIR, 'bench', 'fixtures', 'hansard-reps.xml')) as f:
+    OFFICIAL = f.read()
+PROOF = OFFICIAL.replace('<proof>0</proof>', '<proof>1</proof>').replace('a number of measures', 'several provisional measures')
+SENATE = OFFICIAL.replace('<chamber>House of Reps</chamber>', '<chamber>Senate</chamber>')
+
+
+def items(xml):
+    return list(parse_hansard(io.BytesIO(xml.encode('utf8'))))
+
+
+class HansardIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index = HansardIndex(os.path.join(self.tmp.name, 'hansard.sqlite'))
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp.cleanup()
+
+    def test_official_replaces_proof(self):
+        official = items(OFFICIAL)
+        speeches = len([item for item in official if item['type'] == 'speech'])
+        self.index.add(items(PROOF))
+        self.assertEqual(len(self.index.search('provisional')), 1)
+        self.index.add(official)
+        counts = self.index.counts()
+        self.assertEqual((counts['sessions'], counts['speeches']), (1, speeches))
+        talkers = counts['talkers']
+        self.assertEqual(self.index.search('provisional'), [])
+        self.assertEqual(len(self.index.search('"a number of measures"')), 1)
+
+        # re-loading the same version, and both versions in one batch
+        self.index.add(official)
+        self.index.add(items(PROOF) + official)
+        self.assertEqual(self.index.counts(), counts)
+        self.assertEqual(self.index.search('provisional'), [])
+
+        # the other chamber's sitting on the same day is kept apart
+        self.index.add(items(SENATE))
+        self.assertEqual(self.index.counts(), {'sessions': 2, 'talkers': 2 * talkers, 'speeches': 2 * speeches})
+        self.assertEqual(len(self.index.search('"a number of measures"')), 2)
+
+    def test_feed_without_chambers(self):
+        # talker and speech items from feeds written before they had a chamber take their session's
+        old = [{k: v for k, v in item.items() if k != 'chamber' or item['type'] == 'session'} for item in items(PROOF)]
+        self.index.add(old)
+        self.index.add(items(OFFICIAL))
+        self.assertEqual(self.index.search('provisional'), [])
+        self.assertEqual(self.index.counts()['speeches'], len([item for item in old if item['type'] == 'speech']))
+
+
+if __name__ == '__main__':
+    unittest.main()
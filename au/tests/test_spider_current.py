@@ -0,0 +1,43 @@
+import importlib.util
+import os
+import sys
+import unittest
+
+from scrapy.http import HtmlResponse
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+SRC_DIR = os.path.join(ROOT_DIR, 'au', 'src')
+sys.path.insert(0, SRC_DIR)
+
+# Sessions mode: the sitting days in a page of ParlInfo Hansard search results, each requested once, and the next page.
+
+
+def load_spider_module():
+    spec = importlib.util.spec_from_file_location('spider_current', os.path.join(SRC_DIR, 'spider-current.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class SessionsSearchTest(unittest.TestCase):
+    def test_parse_sessions(self):
+        module = load_spider_module()
+        spider = module.Spider(mode='sessions')
+        with open(os.path.join(ROOT_DIR, 'bench', 'fixtures', 'parlinfo-hansard-results.html'), 'rb') as f:
+            response = HtmlResponse(url=module.SESSIONS_SEARCH_URL, body=f.read(), encoding='utf-8')
+
+        requests = list(spider.parse_sessions(response))
+        sessions = [r for r in requests if r.callback == spider.parse_session_xml]
+        self.assertEqual([module.SESSION_XML_RE.search(r.url).groups() for r in sessions],
+                         [('hansardr', '2021-02-04'), ('hansards', '2021-02-04'), ('hansardr', '2021-02-09')])
+        self.assertEqual(sessions[0].url, 'https://parlinfo.aph.gov.au/parlInfo/download/chamber/hansardr/2021-02-04/'
+                                          'toc_unixml/reps%202021-02-04.xml;fileType=text%2Fxml')
+        self.assertIn('House%20of%20Representatives_2021_02_09', sessions[2].url)
+
+        pages = [r for r in requests if r.callback == spider.parse_sessions]
+        self.assertEqual(len(pages), 1)
+        self.assertIn(';page=1;', pages[0].url)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,262 @@
+# Offline benchmarks of the CA pipeline stages and the AU/NZ spider parse callbacks,
+# using synthetic ParlInfo data (synthetic.py) and recorded pages (fixtures/), so no network access is needed.
+# Reports wall time, peak (Python) memory and rows/sec per stage, and compares them with a stored baseline.
+#
+#   python3 bench/run.py                     run all stages and compare with bench/baseline.json, if any
+#   python3 bench/run.py --save-baseline     run all stages and store the results as the baseline
+#   python3 bench/run.py --only ca. --scale 5
+#
+# The spider stages need scrapy, and are skipped if it is not installed.
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(BENCH_DIR, '..')
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures')
+BASELINE_FILE = os.path.join(BENCH_DIR, 'baseline.json')
+
+sys.path.insert(0, os.path.join(ROOT_DIR, 'ca', 'src'))
+import synthetic
+
+# Each stage is a setup function taking (scale, tmp_dir), which prepares its input and returns
+# a function that runs the stage once and returns the number of rows (records, items) it processed.
+STAGES = {}
+
+def stage(name):
+    def register(setup):
+        STAGES[name] = setup
+        return setup
+    return register
+
+def fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+        return f.read()
+
+# CA pipeline
+
+def parleh_in(tmp_dir):
+    import parleh
+
+    parleh.PARLIAMENTS_DIR = os.path.join(tmp_dir, 'parliaments') + '/'
+    parleh.COMBINED_PARLIAMENTS_FILE = parleh.PARLIAMENTS_DIR + 'all_parliaments.csv'
+    parleh.PEOPLE_DIR = os.path.join(tmp_dir, 'people') + '/'
+    os.makedirs(parleh.PARLIAMENTS_DIR, exist_ok=True)
+    os.makedirs(parleh.PEOPLE_DIR, exist_ok=True)
+    return parleh.Parleh(cache=False, validators_file=None)
+
+def write_profiles(parleh, n, role_types):
+    recs = synthetic.profiles(n, role_types)
+    for rec in recs:
+        person = rec['Person']
+        with open(parleh.profile_filename(person['PersonId'], person), 'w') as f:
+            json.dump(rec, f, indent=2)
+    return recs
+
+@stage('ca.people_df')
+def people_df_stage(scale, tmp_dir):
+    p = parleh_in(tmp_dir)
+    people = synthetic.people(20000 * scale)
+    def run():
+        return len(p.people_df(people, '44'))
+    return run
+
+@stage('ca.combine_parliament_csvs')
+def combine_stage(scale, tmp_dir):
+    p = parleh_in(tmp_dir)
+    num_parls = 10
+    parliaments_dir = sys.modules['parleh'].PARLIAMENTS_DIR
+    for parl_num in range(1, num_parls + 1):
+        people = synthetic.people(2000 * scale, seed=parl_num)
+        p.people_df(people, str(parl_num)).to_csv(f'{parliaments_dir}parliament-{parl_num}-people.csv', encoding='utf8')
+    def run():
+        p.combine_parliament_csvs(1, num_parls)
+        return 2000 * scale * num_parls
+    return run
+
+@stage('ca.extract_roles')
+def extract_roles_stage(scale, tmp_dir):
+    p = parleh_in(tmp_dir)
+    write_profiles(p, 1000 * scale, ['FederalExperience'])
+    def run():
+        return len(p.extract_roles('FederalExperience'))
+    return run
+
+@stage('ca.extract_all_roles')
+def extract_all_roles_stage(scale, tmp_dir):
+    from roles import ROLE_TYPES
+
+    p = parleh_in(tmp_dir)
+    recs = write_profiles(p, 1000 * scale, list(ROLE_TYPES))
+    out_dir = os.path.join(tmp_dir, 'out')
+    os.makedirs(out_dir)
+    def run():
+        p.extract_all_roles(out_dir=out_dir)
+        return sum(len(rec[role_type]) for rec in recs for role_type in ROLE_TYPES)
+    return run
+
+# Spider parse callbacks
+
+# like `scrapy runspider`, with the spider's directory on sys.path for its sibling modules
+def load_spider(path):
+    spider_dir = os.path.dirname(os.path.join(ROOT_DIR, path))
+    if spider_dir not in sys.path:
+        sys.path.append(spider_dir)
+    name = re.sub(r'\W', '_', path)
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT_DIR, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.Spider()
+
+def html_response(url, body):
+    from scrapy.http import HtmlResponse
+    return HtmlResponse(url=url, body=body, encoding='utf-8')
+
+# runs a parse callback on the same page `repeat` times, counting the items and requests it yields
+def callback_runner(callback, response, repeat):
+    def run():
+        return sum(len(list(callback(response))) for _ in range(repeat))
+    return run
+
+@stage('au.current.parse_session_xml')
+def parse_session_xml_stage(scale, tmp_dir):
+    from scrapy.http import XmlResponse
+
+    # a long sitting day: the fixture's debates repeated
+    body = fixture('hansard-reps.xml').decode('utf8')
+    start, end = body.index('<debate>'), body.rindex('</debate>') + len('</debate>')
+    body = body[:start] + body[start:end] * (100 * scale) + body[end:]
+    response = XmlResponse(url='https://parlinfo.aph.gov.au/parlInfo/download/chamber/hansardr/2021-02-04/toc_unixml/reps.xml',
+                           body=body.encode('utf8'), encoding='utf-8')
+    spider = load_spider('au/src/spider-current.py')
+    return callback_runner(spider.parse_session_xml, response, 1)
+
+@stage('au.all.parse_profile')
+def au_parse_profile_stage(scale, tmp_dir):
+    response = html_response('https://parlinfo.aph.gov.au/parlInfo/search/display/display.w3p;query=Id%3A%22handbook%2Fallmps%2FDYH%22',
+                             fixture('au-biography.html'))
+    spider = load_spider('au/src/spider-all.py')
+    return callback_runner(spider.parse_profile, response, 200 * scale)
+
+@stage('au.private_bills.parse_bill')
+def parse_bill_stage(scale, tmp_dir):
+    response = html_response('https://parlinfo.aph.gov.au/parlInfo/search/display/display.w3p;query=Id%3A%22legislation%2Fbillhome%2Fr6519%22',
+                             fixture('au-private-bill.html'))
+    spider = load_spider('au/src/spider-private-bills.py')
+    return callback_runner(spider.parse_bill, response, 200 * scale)
+
+@stage('nz.parse_profile')
+def nz_parse_profile_stage(scale, tmp_dir):
+    response = html_response('https://www.parliament.nz/en/mps-and-electorates/members-of-parliament/ardern-jacinda/',
+                             fixture('nz-mp-profile.html'))
+    spider = load_spider('nz/src/spider-all.py')
+    return callback_runner(spider.parse_profile, response, 200 * scale)
+
+@stage('nz.parse_roles')
+def nz_parse_roles_stage(scale, tmp_dir):
+    response = html_response('https://www.parliament.nz/en/mps-and-electorates/members-of-parliament/ardern-jacinda/',
+                             fixture('nz-mp-profile.html'))
+    spider = load_spider('nz/src/spider-all.py')
+    tables = response.css('table')
+    def run():
+        return sum(len(spider.parse_roles(table)) for _ in range(200 * scale) for table in tables)
+    return run
+
+def measure(name, setup, scale, repeat):
+    with tempfile.TemporaryDirectory() as tmp_dir, contextlib.redirect_stdout(io.StringIO()):
+        run = setup(scale, tmp_dir)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rows = run()
+            times.append(time.perf_counter() - start)
+        # memory is measured in a separate run, since tracing slows everything down
+        tracemalloc.start()
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    seconds = min(times)
+    return {'seconds': round(seconds, 4), 'peak_mb': round(peak / 1e6, 2), 'rows': rows,
+            'rows_per_sec': round(rows / seconds) if seconds else None}
+
+def compare(result, base, tolerance):
+    problems = []
+    for key in ['seconds', 'peak_mb']:
+        if base and base.get(key) and result[key] > base[key] * (1 + tolerance):
+            problems.append(f"{key} {result[key]} vs {base[key]}")
+    return problems
+
+# Where the baseline was recorded, since the timings are only comparable on the same machine
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'commit': commit or None,
+        'date': time.strftime('%Y-%m-%d'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Run offline benchmarks of the CA pipeline and the spider parse callbacks.')
+    parser.add_argument('--only', default='', help='only run stages whose name starts with this prefix')
+    parser.add_argument('--scale', type=int, default=1, help='multiplies the size of each input')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per stage; the fastest is reported')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown or memory growth relative to the baseline')
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('scale') != args.scale:
+            print(f"Baseline was recorded at scale {baseline.get('scale')}, not comparing")
+            baseline = {}
+        else:
+            print(f"Comparing with the baseline recorded on {baseline.get('environment', {})}")
+
+    has_scrapy = importlib.util.find_spec('scrapy') is not None
+    results = {}
+    regressions = {}
+    print(f"{'stage':32} {'seconds':>9} {'peak MB':>9} {'rows':>9} {'rows/sec':>11}  vs baseline")
+    for name, setup in STAGES.items():
+        if not name.startswith(args.only):
+            continue
+        if not name.startswith('ca.') and not has_scrapy:
+            print(f"{name:32} skipped: scrapy is not installed")
+            continue
+        result = results[name] = measure(name, setup, args.scale, args.repeat)
+        base = baseline.get('stages', {}).get(name)
+        problems = compare(result, base, args.tolerance)
+        if problems:
+            regressions[name] = problems
+        status = ('REGRESSION: ' + ', '.join(problems)) if problems else (
+            f"{base['seconds'] / result['seconds']:.2f}x" if base else '-')
+        print(f"{name:32} {result['seconds']:9.3f} {result['peak_mb']:9.2f} {result['rows']:9} {result['rows_per_sec'] or 0:11}  {status}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'scale': args.scale, 'environment': environment(), 'stages': {**baseline.get('stages', {}), **results}},
+                      f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+    elif regressions:
+        sys.exit(f"{len(regressions)} stage(s) regressed by more than {args.tolerance:.0%}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import random
+
+# Synthetic ParlInfo records, shaped like SearchAndRefine results and GetPersonWebProfile profiles, for benchmarks.
+
+PARTIES = ['Liberal Party of Canada', 'Conservative Party of Canada', 'New Democratic Party', 'Bloc Québécois', 'Green Party']
+PROVINCES = ['Ontario', 'Quebec', 'British Columbia', 'Alberta', 'Manitoba', 'Nova Scotia']
+ROLE_CLASSES = ['Minister', 'Parliamentary Secretary', 'Critic', None, '']
+
+def person(rng, person_id):
+    dead = rng.random() < 0.3
+    return {
+        'PersonId': person_id,
+        'LastName': rng.choice(['Smith', 'Tremblay', 'Roy', 'Brown', 'Martin', 'Wilson']) + str(person_id % 97),
+        'UsedFirstName': rng.choice(['John', 'Marie', 'Pierre', 'Anne', 'Jean Paul']),
+        'StraightDisplayName': f'Person {person_id}',
+        'Gender': rng.choice(['M', 'F']),
+        'LanguageEn': rng.choice(['English', 'French']),
+        'PartyEn': rng.choice(PARTIES),
+        'ConstituencyEn': f'<br>Riding {person_id % 338}<br>Sub<br>',
+        'ProvinceEn': rng.choice(PROVINCES),
+        'TypeOfParliamentarianEn': rng.choice(['Member of Parliament', 'Senator']),
+        'DateOfBirth': f'{rng.randint(1850, 1990)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00',
+        'DateOfBirthIsApproximate': rng.random() < 0.1,
+        'CityOfBirthEn': rng.choice(['Toronto', 'Montréal', None]),
+        'ProvinceOfBirthEn': rng.choice(PROVINCES),
+        'CountryOfBirthEn': rng.choice(['Canada', 'Scotland', 'France']),
+        'IsCanadianOrigin': rng.random() < 0.8,
+        'DiedInOffice': rng.random() < 0.05,
+        'Death': {
+            'DateOfDeath': f'{rng.randint(1900, 2020)}-01-01T00:00:00',
+            'DeceasedOnDuty': rng.random() < 0.05,
+        } if dead else None,
+    }
+
+def people(n, seed=0):
+    rng = random.Random(seed)
+    return [person(rng, i + 1) for i in range(n)]
+
+def role(rng, i):
+    return {
+        'PersonRoleId': i,
+        'RoleId': rng.randint(1, 3000),
+        'NameEn': rng.choice(['Mayor', 'Councillor', 'Elected Representative']),
+        'NameFr': 'Nom',
+        'StartDate': f'{rng.randint(1850, 2020)}-01-01T00:00:00',
+        'EndDate': rng.choice([None, f'{rng.randint(1850, 2020)}-12-31T00:00:00']),
+        'OrganizationLongEn': f'Organization {rng.randint(1, 500)}',
+        'Classes': rng.choice([None, [], [{'RoleClassNameEn': rng.choice(ROLE_CLASSES)} for _ in range(rng.randint(1, 3))]]),
+        'MemberOfParliament': rng.choice([None, {'OccupationTypeEn': 'MP', 'OccupationTypeFr': 'Député'}]),
+        'Documents': [],
+    }
+
+# Profiles with `roles_per_person` roles of each of the given role types
+def profiles(n, role_types, roles_per_person=5, seed=0):
+    rng = random.Random(seed)
+    recs = []
+    role_id = 0
+    for p in people(n, seed):
+        rec = {'Person': p}
+        for role_type in role_types:
+            rec[role_type] = []
+            for _ in range(roles_per_person):
+                role_id += 1
+                rec[role_type].append(role(rng, role_id))
+        recs.append(rec)
+    return recs
@@ -0,0 +1,220 @@
+# Asyncio counterpart of the Parleh client (parleh.py), for use inside an event loop:
+# the same query methods as coroutines, over one shared aiohttp connection pool, with at most `concurrency`
+# requests in flight, an optional per-host rate limit, retries with exponential backoff, conditional requests
+# and the same response cache as Parleh. Requires aiohttp (`pipenv install --categories optional`), which is imported when first needed.
+#
+#   async with AsyncParleh(concurrency=20) as p:
+#       people = await p.query_people(options[-1])
+#       async for person_id, profile in p.iter_profiles(person_ids):
+#           ...
+
+import asyncio
+import json
+import os
+import random
+import time
+from urllib.parse import urlencode, urlsplit
+
+from parleh import (CACHE_TTLS, DEFAULT_TIMEOUT, PARL_API_URL, PERSON_PROFILE_PATH, PERSON_SEARCH_PATH, REFINERS_PATH,
+                    RETRY_STATUSES, VALIDATORS_FILE, Validators, decode_json, endpoint_label, parliament_options,
+                    parliament_refiner)
+from common import httpcache, metrics
+from common.httpcache import CacheMiss
+
+
+def aiohttp_module():
+    try:
+        import aiohttp
+    except ImportError:
+        raise ImportError("AsyncParleh requires aiohttp: pipenv install --categories optional") from None
+    return aiohttp
+
+
+class HTTPError(Exception):
+    pass
+
+
+# A response body with its status and headers, read in full before the connection is released
+class Response:
+    def __init__(self, url, status, headers, body):
+        self.url = url
+        self.status_code = status
+        self.headers = headers
+        self.content = body
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise HTTPError(f"{self.status_code} for url: {self.url}")
+
+
+# A response from the cache, with its headers in the same case-insensitive mapping as aiohttp's (multidict is an aiohttp dependency)
+def cached_response(cached):
+    from multidict import CIMultiDict, CIMultiDictProxy
+    return Response(cached.url, cached.status, CIMultiDictProxy(CIMultiDict(cached.headers)), cached.body)
+
+
+class AsyncRateLimiter:
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_time = 0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        start = max(now, self.next_time)
+        self.next_time = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+class AsyncParleh:
+    _refiners = None
+
+    def __init__(self, concurrency=10, rate_limit=None, api_url=None, timeout=DEFAULT_TIMEOUT, retries=5, backoff_factor=1,
+                 validators_file=VALIDATORS_FILE, cache=None):
+        self.api_url = (api_url or os.environ.get('PARLEH_API_URL') or PARL_API_URL).rstrip('/')
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.validators = Validators(validators_file)
+        if cache is None and httpcache.is_enabled():
+            cache = httpcache.ResponseCache(ttls=CACHE_TTLS)
+        self.cache = cache or None
+        self.rate_limit = rate_limit
+        self._limiters = {}
+        self._session = None
+        self._semaphore = None
+        self._refiners_lock = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        await asyncio.to_thread(self.validators.save)
+
+    # the shared connection pool, created on first use (inside the running event loop)
+    def session(self):
+        if self._session is None:
+            aiohttp = aiohttp_module()
+            connect_timeout, read_timeout = self.timeout
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.concurrency),
+                timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout))
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._session
+
+    async def throttle(self, url):
+        host = urlsplit(url).netloc
+        limiter = self._limiters.get(host)
+        if limiter is None:
+            limiter = self._limiters[host] = AsyncRateLimiter(self.rate_limit)
+        await limiter.wait()
+
+    async def fetch(self, url, params, headers, endpoint):
+        aiohttp = aiohttp_module()
+        session = self.session()
+        for attempt in range(self.retries + 1):
+            with metrics.timer('parleh_throttle_seconds', endpoint=endpoint):
+                await self.throttle(url)
+            try:
+                async with self._semaphore:
+                    with metrics.timer('parleh_request_seconds', endpoint=endpoint):
+                        async with session.get(url, params=params, headers=headers) as r:
+                            response = Response(str(r.url), r.status, r.headers, await r.read())
+                metrics.inc('parleh_requests_total', endpoint=endpoint, status=response.status_code)
+                metrics.inc('parleh_response_bytes_total', len(response.content), endpoint=endpoint)
+                metrics.observe('parleh_response_size_bytes', len(response.content), buckets=metrics.BYTES_BUCKETS, endpoint=endpoint)
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    return response
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == self.retries:
+                    raise
+            # exponential backoff with jitter, like urllib3's Retry used by Parleh
+            await asyncio.sleep(self.backoff_factor * (2 ** attempt) * random.uniform(0.5, 1))
+
+    # Same as Parleh.get: from the response cache if fresh there; if conditional, returns None on 304 Not Modified.
+    # The cache is synchronous SQLite, so its calls run in a worker thread rather than blocking the event loop.
+    async def get(self, path, params=None, headers=None, conditional=False):
+        url = self.api_url + path
+        endpoint = endpoint_label(path)
+        if self.cache:
+            cached = await asyncio.to_thread(self.cache.get, url, params)
+            if cached is not None:
+                metrics.inc('parleh_requests_total', endpoint=endpoint, status='cached')
+                return cached_response(cached)
+            if self.cache.offline:
+                raise CacheMiss(f"Offline and not cached: {url} {params or ''}")
+
+        key = url + ('?' + urlencode(params) if params else '')
+        headers = dict(headers or {})
+        if conditional:
+            headers.update(self.validators.request_headers(key))
+        r = await self.fetch(url, params, headers, endpoint)
+        if r.status_code == 304:
+            if self.cache:
+                await asyncio.to_thread(self.cache.touch, url, params)
+            return None
+        r.raise_for_status()
+        self.validators.update(key, r)
+        if self.cache:
+            await asyncio.to_thread(self.cache.put, url, r.status_code, list(r.headers.items()), r.content, params)
+        return r
+
+    async def query_refiners(self):
+        r = await self.get(REFINERS_PATH, headers=dict(Accept='application/json'))
+        return decode_json(r, REFINERS_PATH)
+
+    async def refiners(self):
+        # concurrent callers (e.g. query_parliaments) share one request
+        self._refiners_lock = self._refiners_lock or asyncio.Lock()
+        async with self._refiners_lock:
+            self._refiners = self._refiners or await self.query_refiners()
+        return self._refiners
+
+    async def parliament_refiner(self):
+        return parliament_refiner(await self.refiners())
+
+    async def parliament_options(self):
+        return parliament_options(await self.parliament_refiner())
+
+    # returns None if conditional and unchanged since the last download
+    async def query_people(self, parl_option, conditional=False):
+        refiner_id = (await self.parliament_refiner())['RefinerId']
+        option_id = parl_option['OptionId']
+        r = await self.get(PERSON_SEARCH_PATH, params=dict(refiners=f'{refiner_id}-{option_id},'), conditional=conditional)
+        return r and decode_json(r, PERSON_SEARCH_PATH)
+
+    # returns None if conditional and unchanged since the last download
+    async def query_profile(self, person_id, conditional=False):
+        r = await self.get(PERSON_PROFILE_PATH % person_id, conditional=conditional)
+        return r and decode_json(r, PERSON_PROFILE_PATH)
+
+    # People in each of the parliaments, fetched concurrently: {parliament option id: people}
+    async def query_parliaments(self, parl_options, conditional=False):
+        results = await asyncio.gather(*[self.query_people(option, conditional) for option in parl_options])
+        return {option['OptionId']: people for option, people in zip(parl_options, results)}
+
+    # Yields (person_id, profile) for each person as their profile arrives, in completion order;
+    # profile is None if conditional and unchanged, or the exception if the request failed or returned invalid JSON.
+    async def iter_profiles(self, person_ids, conditional=False):
+        aiohttp = aiohttp_module()
+
+        async def fetch(person_id):
+            try:
+                return person_id, await self.query_profile(person_id, conditional)
+            except (aiohttp.ClientError, asyncio.TimeoutError, HTTPError, CacheMiss, ValueError) as e:
+                return person_id, e
+
+        for future in asyncio.as_completed([fetch(person_id) for person_id in person_ids]):
+            yield await future
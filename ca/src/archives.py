@@ -0,0 +1,160 @@
+import os
+import struct
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+# Incremental, parallel zip archives of the data files (parliaments.zip, people.zip).
+#
+# An archive is brought up to date with a list of (member name, file path) pairs:
+# members whose file is unchanged (same size and modification time, or failing that the same CRC) are copied
+# from the existing archive as raw compressed bytes, without decompressing or recompressing them;
+# only new and changed files are compressed, in a pool of threads (zlib and zstd release the GIL while compressing).
+# Members whose files are gone are dropped. If nothing changed, the archive is left as it is.
+#
+# Members are compressed with deflate, readable by any unzip tool, or optionally with zstd (zip method 93),
+# which is faster and smaller but needs a recent tool to extract (7-Zip, libarchive/bsdtar, Python 3.14's zipfile).
+# zstd requires Python 3.14 or the zstandard package (`pipenv install --categories optional`), imported when first needed.
+
+ZIP_ZSTD = 93
+COMPRESS_TYPES = {'deflate': zipfile.ZIP_DEFLATED, 'zstd': ZIP_ZSTD}
+DEFAULT_LEVELS = {'deflate': 6, 'zstd': 3}
+# files compressed per batch; compressed members are held in memory until written out in order
+BATCH_SIZE = 256
+
+
+def zstd_compress_func(level):
+    try:
+        from compression import zstd
+        return lambda data: zstd.compress(data, level)
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("zstd archives require Python 3.14 or zstandard: pipenv install --categories optional") from None
+    return lambda data: zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def deflate_compress_func(level):
+    def compress(data):
+        c = zlib.compressobj(level, zlib.DEFLATED, -15)  # raw deflate, as stored in zip files
+        return c.compress(data) + c.flush()
+    return compress
+
+
+def compress_func(compression, level=None):
+    level = DEFAULT_LEVELS[compression] if level is None else level
+    return zstd_compress_func(level) if compression == 'zstd' else deflate_compress_func(level)
+
+
+# Raw (still compressed) bytes of a member of an open archive file
+def read_raw(f, info):
+    f.seek(info.header_offset)
+    header = f.read(zipfile.sizeFileHeader)
+    fields = struct.unpack(zipfile.structFileHeader, header)
+    f.seek(fields[zipfile._FH_FILENAME_LENGTH] + fields[zipfile._FH_EXTRA_FIELD_LENGTH], os.SEEK_CUR)
+    return f.read(info.compress_size)
+
+
+# Appends a member, already compressed, to an archive open for writing.
+# (ZipFile has no public API for this, so this does what ZipFile.write does after compressing.)
+def write_raw(zf, info, data):
+    info.flag_bits &= ~0x08  # sizes and CRC are in the local header, not in a trailing data descriptor
+    info.header_offset = zf.fp.tell()
+    zip64 = info.file_size > zipfile.ZIP64_LIMIT or info.compress_size > zipfile.ZIP64_LIMIT
+    zf.fp.write(info.FileHeader(zip64))
+    zf.fp.write(data)
+    zf.filelist.append(info)
+    zf.NameToInfo[info.filename] = info
+    zf.start_dir = zf.fp.tell()
+    zf._didModify = True
+
+
+# A copy of the member's metadata, for writing it to another archive
+def copy_info(old):
+    info = zipfile.ZipInfo(old.filename, old.date_time)
+    info.compress_type = old.compress_type
+    info.external_attr = old.external_attr
+    info.create_system = old.create_system
+    info.flag_bits = old.flag_bits
+    info.CRC = old.CRC
+    info.file_size = old.file_size
+    info.compress_size = old.compress_size
+    return info
+
+
+def file_crc(path):
+    crc = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+# Whether the file is the same as the existing member, so the member can be copied as it is.
+def unchanged(old, info, path, compress_type):
+    if old is None or old.compress_type != compress_type or old.file_size != info.file_size:
+        return False
+    return old.date_time == info.date_time or old.CRC == file_crc(path)
+
+
+def compress_member(info, path, compress):
+    with open(path, 'rb') as f:
+        data = f.read()
+    info.CRC = zlib.crc32(data)
+    info.file_size = len(data)
+    compressed = compress(data)
+    info.compress_size = len(compressed)
+    return info, compressed
+
+
+# Brings the archive at `zip_path` up to date with `members`, a list of (member name, file path) pairs.
+# Returns (number of members added or updated, number copied unchanged, number removed).
+def update_zip(zip_path, members, compression='deflate', level=None, workers=None):
+    compress_type = COMPRESS_TYPES[compression]
+    compress = compress_func(compression, level)
+    old_zip = zipfile.ZipFile(zip_path) if os.path.exists(zip_path) else None
+    old_infos = {info.filename: info for info in old_zip.infolist()} if old_zip else {}
+
+    # member name, info for the new archive, file path, and whether it must be (re)compressed
+    plan = []
+    for name, path in members:
+        info = zipfile.ZipInfo.from_file(path, name)
+        info.compress_type = compress_type
+        old = old_infos.get(name)
+        if unchanged(old, info, path, compress_type):
+            plan.append((name, copy_info(old), path, False))
+        else:
+            plan.append((name, info, path, True))
+
+    changed = sum(recompress for _, _, _, recompress in plan)
+    removed = len(set(old_infos) - {name for name, _, _, _ in plan})
+    same_order = [name for name, _, _, _ in plan] == [info.filename for info in old_zip.infolist()] if old_zip else False
+    if old_zip and not changed and not removed and same_order:
+        old_zip.close()
+        return 0, len(plan), 0
+
+    tmp_path = zip_path + '.tmp'
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor, \
+            zipfile.ZipFile(tmp_path, 'w', allowZip64=True) as zf:
+        old_file = old_zip.fp if old_zip else None
+        for i in range(0, len(plan), BATCH_SIZE):
+            batch = plan[i:i + BATCH_SIZE]
+            futures = {name: executor.submit(compress_member, info, path, compress)
+                       for name, info, path, recompress in batch if recompress}
+            for name, info, path, recompress in batch:
+                if recompress:
+                    info, data = futures[name].result()
+                else:
+                    data = read_raw(old_file, old_infos[name])
+                write_raw(zf, info, data)
+    if old_zip:
+        old_zip.close()
+    os.replace(tmp_path, zip_path)
+    return changed, len(plan) - changed, removed
+
+
+# (member name, path) pairs for the files in `directory` whose names match `pattern`, sorted by name
+def directory_members(directory, pattern):
+    return [(name, os.path.join(directory, name)) for name in sorted(os.listdir(directory)) if pattern.match(name)]
@@ -0,0 +1,6 @@
+import sys
+from cli import main
+
+# same as `./parleh zips ...` (see cli.py)
+if __name__ == '__main__':
+    main(['zips'] + sys.argv[1:])
@@ -0,0 +1,6 @@
+import sys
+from cli import main
+
+# same as `./parleh parquet ...` (see cli.py)
+if __name__ == '__main__':
+    main(['parquet'] + sys.argv[1:])
@@ -0,0 +1,239 @@
+import argparse
+import os
+import re
+import time
+import zipfile
+from datetime import datetime, timezone
+
+from config import *
+import parleh
+from common import metrics
+from parleh import Parleh
+
+# Single entry point for the CA pipeline: `./parleh COMMAND [options]` from the ca directory (or `python3 cli.py ...` here).
+# parleh.py imports pandas, numpy and requests only where they are used, so `--help`, `status` and the other commands
+# start without loading them, and each command loads only what it needs.
+#
+# `run` executes several stages in one process, sharing one Parleh instance (its HTTP connections, refiners and caches)
+# and paying the interpreter and import startup once, e.g.:
+#   ./parleh run download-parliaments download-profiles zips roles --concurrency 16
+# It accepts the options of all its stages; each stage uses those that apply to it.
+
+STAGES = ['download-parliaments', 'download-profiles', 'roles', 'zips', 'parquet', 'import-profiles', 'export-profiles']
+
+
+def download_parliaments(p, args):
+    p.set_rate_limit(None)
+    print(f"Downloading data for parliaments {start_parl} through {end_parl}, including current: {include_current}, incremental: {args.incremental}")
+    print("Options:")
+    for option in p.parliament_options():
+        print(option)
+    changed = p.download_all_parliaments(start_parl, end_parl, include_current, incremental=args.incremental)
+    p.combine_parliament_csvs(start_parl, end_parl, include_current, changed=changed if args.incremental else None)
+
+
+def download_profiles(p, args):
+    p.set_rate_limit(args.rate)
+    p.download_all_profiles(concurrency=args.concurrency, refresh=args.refresh)
+
+
+def roles(p, args):
+    role_field = getattr(args, 'role_field', None)
+    if role_field:
+        df = p.extract_roles(role_field, workers=args.workers)
+        print(df.to_csv())
+    else:
+        p.extract_all_roles(workers=args.workers)
+
+
+def zips(p, args):
+    p.update_archives(args.compression, args.level, args.workers)
+
+
+def parquet(p, args):
+    print(f"Writing Parquet datasets to {parleh.PARQUET_DIR}...")
+    p.write_parliaments_parquet(start_parl, end_parl, include_current)
+    p.write_people_parquet()
+    p.write_roles_parquet()
+
+
+def import_profiles(p, args):
+    p.import_profiles_to_store()
+
+
+def export_profiles(p, args):
+    p.export_profiles_from_store()
+
+
+def options(p, args):
+    for option in p.parliament_options():
+        print(option)
+
+
+STAGE_FUNCS = {
+    'download-parliaments': download_parliaments,
+    'download-profiles': download_profiles,
+    'roles': roles,
+    'zips': zips,
+    'parquet': parquet,
+    'import-profiles': import_profiles,
+    'export-profiles': export_profiles,
+}
+
+
+def make_parleh(args, stages):
+    return Parleh(pool_size=getattr(args, 'concurrency', profile_concurrency),
+                  parquet=getattr(args, 'parquet', False),
+                  streaming=getattr(args, 'stream', False),
+                  profile_store=use_profile_store or bool({'import-profiles', 'export-profiles'} & set(stages)))
+
+
+def run_stages(args, stages):
+    p = make_parleh(args, stages)
+    for i, stage in enumerate(stages, 1):
+        if len(stages) > 1:
+            print(f"=== {stage} ({i}/{len(stages)})")
+        start = time.perf_counter()
+        with metrics.timer('parleh_command_seconds', command=stage):
+            STAGE_FUNCS[stage](p, args)
+        if len(stages) > 1:
+            print(f"=== {stage} done in {time.perf_counter() - start:.1f}s")
+
+
+def file_status(path):
+    if not os.path.exists(path):
+        return 'missing'
+    st = os.stat(path)
+    modified = datetime.fromtimestamp(st.st_mtime, timezone.utc).isoformat(timespec='seconds')
+    return f"{st.st_size:,} bytes, modified {modified}"
+
+
+# What has been downloaded and built so far, from the files alone (no requests, pandas or profile parsing)
+def status(args):
+    manifest = parleh.ParliamentsManifest()
+    entries = manifest.entries
+    print(f"Parliaments: {len(entries)} in {parleh.PARLIAMENTS_MANIFEST_FILE}")
+    if entries:
+        fetched = max(entries.items(), key=lambda item: item[1].get('fetchedAt', ''))
+        changed = max(entries.items(), key=lambda item: item[1].get('changedAt', ''))
+        print(f"  last fetched: {fetched[1].get('fetchedAt')} (parliament {fetched[0]})")
+        print(f"  last changed: {changed[1].get('changedAt')} (parliament {changed[0]})")
+        if 'current' in entries:
+            print(f"  current: {entries['current'].get('people')} people")
+    print(f"  {parleh.COMBINED_PARLIAMENTS_FILE}: {file_status(parleh.COMBINED_PARLIAMENTS_FILE)}")
+
+    if use_profile_store:
+        if os.path.exists(parleh.PROFILE_STORE_FILE):
+            from profile_store import ProfileStore
+            store = ProfileStore(parleh.PROFILE_STORE_FILE)
+            print(f"Profiles: {len(store)} in {parleh.PROFILE_STORE_FILE}")
+            store.close()
+        else:
+            print(f"Profiles: {parleh.PROFILE_STORE_FILE} missing")
+    else:
+        pattern = re.compile(parleh.PERSON_FILE_RE)
+        count = sum(1 for name in os.listdir(parleh.PEOPLE_DIR) if pattern.match(name)) if os.path.isdir(parleh.PEOPLE_DIR) else 0
+        print(f"Profiles: {count} files in {parleh.PEOPLE_DIR}")
+
+    print("Roles:")
+    for filename in parleh.ROLE_TYPES.values():
+        path = os.path.join(parleh.PEOPLE_DIR, filename)
+        print(f"  {path}: {file_status(path)}")
+
+    print("Archives:")
+    for path in [parleh.PARLIAMENTS_ARCHIVE, parleh.PEOPLE_ARCHIVE]:
+        members = ''
+        if os.path.exists(path):
+            with zipfile.ZipFile(path) as zf:
+                members = f", {len(zf.infolist())} files"
+        print(f"  {path}: {file_status(path)}{members}")
+
+    print(f"Parquet: {parleh.PARQUET_DIR} {'present' if os.path.isdir(parleh.PARQUET_DIR) else 'missing'}")
+
+
+def parliaments_args(parser):
+    parser.add_argument('--incremental', action='store_true',
+                        help='only fetch the current and latest parliaments (and any not yet downloaded), and patch all_parliaments.csv with those that changed')
+    parser.add_argument('--stream', action='store_true',
+                        help='parse each parliament as it downloads, writing its files without holding it in memory, and append them to all_parliaments.csv as text')
+
+
+def profiles_args(parser):
+    parser.add_argument('--concurrency', type=int, default=profile_concurrency, help='number of profiles to fetch concurrently')
+    parser.add_argument('--refresh', action='store_true', help='re-fetch existing profiles, rewriting those that changed')
+    parser.add_argument('--rate', type=float, default=requests_per_second, help='maximum requests per second (0 for no limit)')
+
+
+def parquet_args(parser):
+    parser.add_argument('--parquet', action='store_true',
+                        help='also write downloaded parliaments and extracted roles to the Parquet datasets in data/parquet')
+
+
+def workers_args(parser):
+    parser.add_argument('--workers', type=int, default=parse_workers,
+                        help='number of processes parsing profiles, or threads compressing files (default: one per CPU)')
+
+
+def zips_args(parser):
+    parser.add_argument('--compression', choices=['deflate', 'zstd'], default='deflate',
+                        help='zstd is faster and smaller, but needs a recent unzip tool (and Python 3.14 or the zstandard package)')
+    parser.add_argument('--level', type=int, help='compression level (default: 6 for deflate, 3 for zstd)')
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(prog='parleh', description='Download and process the Parlinfo people data.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('options', help='list the parliament options')
+    commands.add_parser('status', help='summarize the downloaded and built files, without making any requests')
+
+    p = commands.add_parser('download-parliaments', help='download the people in each parliament and combine them into all_parliaments.csv')
+    parliaments_args(p)
+    parquet_args(p)
+
+    p = commands.add_parser('download-profiles', help='download the full profile of each person in all_parliaments.csv')
+    profiles_args(p)
+
+    p = commands.add_parser('roles', help='extract roles from all profiles, to CSV')
+    p.add_argument('role_field', nargs='?',
+                   help='print the roles of this role field as CSV (default: write all role types to their CSV files in data/people)')
+    p.add_argument('--all', action='store_true', help='write all role types to their CSV files in a single pass (the default)')
+    workers_args(p)
+    parquet_args(p)
+
+    p = commands.add_parser('zips', help='update parliaments.zip and people.zip, recompressing only new and changed files')
+    zips_args(p)
+    p.add_argument('--workers', type=int, help='number of threads compressing files (default: one per CPU)')
+
+    commands.add_parser('parquet', help='build the Parquet datasets from the existing CSVs and profiles (requires pyarrow)')
+    commands.add_parser('import-profiles', help='copy the per-person JSON files into the profile store')
+    commands.add_parser('export-profiles', help='write the profile store out to per-person JSON files')
+
+    p = commands.add_parser('run', help='run several stages in one process, in the order given')
+    p.add_argument('stages', nargs='+', choices=STAGES, metavar='STAGE', help=f"one of: {', '.join(STAGES)}")
+    parliaments_args(p)
+    profiles_args(p)
+    workers_args(p)
+    zips_args(p)
+    parquet_args(p)
+    return parser
+
+
+def main(argv=None):
+    parser = make_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'status':
+        status(args)
+    elif args.command == 'options':
+        options(make_parleh(args, []), args)
+    elif args.command == 'run':
+        run_stages(args, args.stages)
+    else:
+        if args.command == 'roles' and args.role_field and args.all:
+            parser.error('give either a role field or --all')
+        run_stages(args, [args.command])
+
+
+# the guard is needed for the worker processes extracting roles, which import this module when not forked
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+# Optional columnar storage: Parquet datasets with explicit dtypes, so loads skip CSV parsing and date/type inference.
+# Requires pyarrow (`pipenv install --categories optional`), which is imported when first needed.
+#
+# Layout under the given directory (data/parquet by default):
+#   parliaments/parliament=<id>/part-0.parquet   people in each parliament, as in parliament-<id>-people.csv
+#   people.parquet                               the Person part of each profile, flattened to scalar columns
+#   roles/role_type=<type>/part-0.parquet        role tables, as in the role CSVs
+
+import os
+
+PARLIAMENT_DTYPES = {
+    'LastName': 'string',
+    'UsedFirstName': 'string',
+    'StraightDisplayName': 'string',
+    'Gender': 'category',
+    'LanguageEn': 'category',
+    'PartyEn': 'category',
+    'ConstituencyEn': 'string',
+    'ProvinceEn': 'category',
+    'TypeOfParliamentarianEn': 'category',
+    'DateOfBirth': 'datetime64[ns]',
+    'DateOfBirthIsApproximate': 'boolean',
+    'CityOfBirthEn': 'string',
+    'ProvinceOfBirthEn': 'category',
+    'CountryOfBirthEn': 'category',
+    'IsCanadianOrigin': 'boolean',
+    'DiedInOffice': 'boolean',
+    'DateOfDeath': 'datetime64[ns]',
+    'DeceasedOnDuty': 'boolean',
+}
+
+# low-cardinality text columns of profiles and roles, stored as categoricals
+CATEGORY_COLS = ['Gender', 'LanguageEn', 'PartyEn', 'ProvinceEn', 'ProvinceOfBirthEn', 'CountryOfBirthEn',
+                 'TypeOfParliamentarianEn', 'OrganizationTypeEn', 'OrganizationProvinceEn', 'EndReasonEn',
+                 'EndReasonTypeEn', 'MemberOfParliament', 'Classes', 'NameEn', 'DiplomaLongEn', 'DiplomaShortEn']
+
+def pyarrow_parquet():
+    try:
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet storage requires pyarrow: pipenv install --categories optional") from None
+    return pyarrow.parquet
+
+def to_datetime(s):
+    import pandas as pd
+    return pd.to_datetime(s, errors='coerce', format='ISO8601')
+
+def with_dtypes(df, dtypes):
+    df = df.copy()
+    for col, dtype in dtypes.items():
+        if col not in df.columns:
+            continue
+        if dtype.startswith('datetime'):
+            df[col] = to_datetime(df[col])
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+def is_bool_col(s):
+    values = s.dropna()
+    return s.dtype == bool or (len(values) > 0 and values.map(lambda v: isinstance(v, bool)).all())
+
+# Infers dtypes for tables with varying columns (profiles, roles) from column naming conventions.
+def infer_dtypes(df):
+    dtypes = {}
+    for col in df.columns:
+        if col.endswith('Date') or col.startswith('DateOf'):
+            dtypes[col] = 'datetime64[ns]'
+        elif col in CATEGORY_COLS:
+            dtypes[col] = 'category'
+        elif is_bool_col(df[col]):
+            dtypes[col] = 'boolean'
+        elif col.endswith('Id') or col in ['GraduationYear', 'Ordinal', 'ParliamentNumber']:
+            dtypes[col] = 'Int64'
+        elif df[col].dtype == object:
+            dtypes[col] = 'string'
+    return dtypes
+
+def write_table(df, path):
+    pq = pyarrow_parquet()
+    import pyarrow
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pyarrow.Table.from_pandas(df)
+    pq.write_table(table, path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+def read_table(path, columns=None, filters=None):
+    pq = pyarrow_parquet()
+    return pq.read_table(path, columns=columns, filters=filters, memory_map=True, partitioning='hive').to_pandas()
+
+def partition_path(dataset_dir, key, value):
+    return os.path.join(dataset_dir, f'{key}={value}', 'part-0.parquet')
+
+# df as returned by Parleh.people_df (indexed by PersonId)
+def write_parliament(df, parl_id, parquet_dir):
+    write_table(with_dtypes(df, PARLIAMENT_DTYPES), partition_path(os.path.join(parquet_dir, 'parliaments'), 'parliament', parl_id))
+
+# Reads the given parliaments (default all), with a 'parliament' column, like Parleh.read_all_parliament_csvs.
+def read_parliaments(parquet_dir, parl_ids=None, columns=None):
+    filters = [('parliament', 'in', [str(p) for p in parl_ids])] if parl_ids is not None else None
+    return read_table(os.path.join(parquet_dir, 'parliaments'), columns, filters)
+
+def write_people(people, parquet_dir):
+    import pandas as pd
+    df = pd.DataFrame(people)
+    df = df[[col for col in df.columns if not col.endswith('Fr')]]
+    # nested values (lists, dicts) are kept in the JSON profiles only
+    scalar_cols = [col for col in df.columns if not df[col].map(lambda v: isinstance(v, (list, dict))).any()]
+    df = df[scalar_cols].set_index('PersonId').sort_index()
+    write_table(with_dtypes(df, infer_dtypes(df)), os.path.join(parquet_dir, 'people.parquet'))
+
+def read_people(parquet_dir, columns=None):
+    return read_table(os.path.join(parquet_dir, 'people.parquet'), columns)
+
+# df as returned by Parleh.extract_roles, or read from a role CSV
+def write_roles(df, role_type, parquet_dir):
+    write_table(with_dtypes(df, infer_dtypes(df)), partition_path(os.path.join(parquet_dir, 'roles'), 'role_type', role_type))
+
+def read_roles(role_type, parquet_dir, columns=None):
+    return read_table(partition_path(os.path.join(parquet_dir, 'roles'), 'role_type', role_type), columns)
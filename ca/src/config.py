@@ -1,3 +1,13 @@
 start_parl = 1
 end_parl = 44
 include_current = True
+
+# profile downloads: number of concurrent requests, and maximum requests per second to lop.parl.ca
+profile_concurrency = 8
+requests_per_second = 5
+
+# number of processes parsing profile JSON files when extracting roles (None for one per CPU)
+parse_workers = None
+
+# keep profiles in a single SQLite file, data/people/profiles.sqlite, instead of one JSON file per person
+use_profile_store = False
@@ -1,4 +1,6 @@
-from parleh import Parleh
+import sys
+from cli import main
 
-parleh = Parleh()
-parleh.download_all_profiles()
+# same as `./parleh download-profiles ...` (see cli.py)
+if __name__ == '__main__':
+    main(['download-profiles'] + sys.argv[1:])
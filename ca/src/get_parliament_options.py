@@ -1,6 +1,6 @@
-from parleh import Parleh
+import sys
+from cli import main
 
-parleh = Parleh()
-
-for option in parleh.parliament_options():
-    print(option)
+# same as `./parleh options ...` (see cli.py)
+if __name__ == '__main__':
+    main(['options'] + sys.argv[1:])
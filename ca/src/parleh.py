@@ -1,13 +1,46 @@
+import archives
+import columnar
+import csv
+import hashlib
 import json
 import os.path
-import pandas as pd
 import re
-import requests
-from requests.exceptions import HTTPError
+import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from functools import partial
+from itertools import islice
+from people_stream import ParliamentWriter, append_parliament_csv, iter_json_array
+from profile_store import ProfileStore
+from urllib.parse import urlencode, urlsplit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common import httpcache, metrics
+from common.dates import iso_date, to_dates
+from common.httpcache import CacheMiss, DAY, HOUR
+from roles import (PERSON_COLS, ROLE_TYPES, RoleTableWriter, profile_role_rows, record_role_rows, shard_role_rows,
+                   store_shard_role_rows)
+
+# pandas, numpy and requests are imported where they are used, so that commands that don't need them start quickly (see cli.py)
 
 def trim(s):
     return s.lstrip('<br>').rstrip('<br>').replace('<br>', '|') if isinstance(s, str) else s
 
+# Vectorized trim of a column: each distinct value is trimmed once, and the results spread back by position.
+# (Faster than the .str accessor methods on object columns, since most columns have few distinct values.)
+def trim_col(s):
+    import numpy as np
+    import pandas as pd
+    if s.dtype != object:
+        return s
+    codes, uniques = pd.factorize(s)
+    trimmed = np.array([trim(v) for v in uniques] + [None], dtype=object)
+    # code -1 (missing value) takes the trailing None, and is then restored to the original missing value
+    return pd.Series(trimmed.take(codes), index=s.index, name=s.name).where(codes >= 0, s)
+
 def num_prefix(str):
     return int(str.split('-')[0])
 
@@ -15,9 +48,9 @@ def name_suffix(str):
     return str.split('-')[-1]
 
 def drop_time(df):
-    date_cols = [col for col in df.columns if col.endswith('Date')]
-    for col in date_cols:
-        df[col] = df[col].str[:10]
+    date_cols = [col for col in df.columns if col.endswith('Date') and df[col].dtype == object]
+    if date_cols:
+        df[date_cols] = df[date_cols].apply(lambda s: s.str[:10])
 
 def drop_french(df):
     to_drop = [col for col in df.columns if col.endswith('Fr')]
@@ -30,17 +63,43 @@ def drop_empty_cols(df):
 def drop_unsupported_cols(df):
     df.drop(columns=['Documents', 'Senator'], inplace=True, errors='ignore')
     
+# Vectorized equivalent of roles.flatten_role over a DataFrame of unflattened role rows.
+def flatten_role_cols(df):
+    if 'Classes' in df.columns and df['Classes'].dtype == object:
+        classes = df['Classes']
+        names = classes.explode().str.get('RoleClassNameEn')
+        names = names[names.notna() & (names != '')]
+        # concatenating with a trailing separator is much faster than agg('|'.join)
+        joined = (names + '|').groupby(level=0).sum().str[:-1].reindex(classes.index, fill_value='')
+        df['Classes'] = joined.where(classes.notna(), None)
+
+    # MP info is a dict with keys OccupationTypeEn, OccupationTypeFr. Use the former.
+    if 'MemberOfParliament' in df.columns and df['MemberOfParliament'].dtype == object:
+        mp_info = df['MemberOfParliament']
+        df['MemberOfParliament'] = mp_info.str.get('OccupationTypeEn').where(mp_info.notna(), mp_info)
+
 def cleanup(df):
     drop_time(df)
     drop_french(df)
     # drop_empty_cols(df)
     drop_unsupported_cols(df)
 
+# can be overridden with the PARLEH_API_URL environment variable, e.g. to run against a local stub server
 PARL_API_URL = 'https://lop.parl.ca/ParlinfoWebAPI'
-PERSON_URL = PARL_API_URL + '/Person/'
-PERSON_SEARCH_URL = PERSON_URL + 'SearchAndRefine'
-PERSON_PROFILE_URL = PERSON_URL + 'GetPersonWebProfile/%d'
-REFINERS_URL = PARL_API_URL + '/Refiner/GetRefiners'
+PERSON_SEARCH_PATH = '/Person/SearchAndRefine'
+PERSON_PROFILE_PATH = '/Person/GetPersonWebProfile/%d'
+REFINERS_PATH = '/Refiner/GetRefiners'
+
+# (connect, read) timeouts in seconds; SearchAndRefine for a large parliament can be slow to respond
+DEFAULT_TIMEOUT = (10, 120)
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+
+# how long cached responses are used without going back to the server (see common/httpcache.py)
+CACHE_TTLS = [
+    (REFINERS_PATH, DAY),
+    (PERSON_SEARCH_PATH, HOUR),
+    (PERSON_PROFILE_PATH.replace('%d', ''), HOUR),
+]
 
 REGULAR_COLS = ['PersonId', 'LastName', 'UsedFirstName', 'StraightDisplayName', 'Gender', 'LanguageEn',
     'PartyEn', 'ConstituencyEn', 'ProvinceEn', 'TypeOfParliamentarianEn', 
@@ -49,58 +108,345 @@ REGULAR_COLS = ['PersonId', 'LastName', 'UsedFirstName', 'StraightDisplayName',
 DEATH_COLS = ['DateOfDeath', 'DeceasedOnDuty']
 DATE_COLS = ['DateOfBirth', 'DateOfDeath']
 
+# a row of the parliament CSV files, in streaming mode (see people_stream.py)
+PersonRow = namedtuple('PersonRow', REGULAR_COLS + DEATH_COLS)
+
+# size of the chunks in which streamed responses are read
+STREAM_CHUNK_SIZE = 64 * 1024
+
+PERSON_FILE_RE = r'[0-9]+-.+\.json$'
+PARLIAMENT_FILE_RE = r'parliament-.+-people\.(csv|json)$'
+
 DATA_DIR = '../data/'
 PARLIAMENTS_DIR = DATA_DIR + 'parliaments/'
 PEOPLE_DIR = DATA_DIR + 'people/'
+PARQUET_DIR = DATA_DIR + 'parquet/'
+PROFILE_STORE_FILE = PEOPLE_DIR + 'profiles.sqlite'
+VALIDATORS_FILE = DATA_DIR + 'http_validators.json'
+PARLIAMENTS_MANIFEST_FILE = PARLIAMENTS_DIR + 'manifest.json'
+COMBINED_PARLIAMENTS_FILE = PARLIAMENTS_DIR + 'all_parliaments.csv'
+PARLIAMENTS_ARCHIVE = PARLIAMENTS_DIR + 'parliaments.zip'
+PEOPLE_ARCHIVE = PEOPLE_DIR + 'people.zip'
+
+# Spaces out request start times so that at most `rate` requests per second are issued, across all threads.
+class RateLimiter:
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.lock = threading.Lock()
+        self.next_time = 0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time)
+            self.next_time = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+# ETag / Last-Modified values of previously downloaded resources, keyed by URL with query string,
+# used to make conditional requests so unchanged resources come back as 304 Not Modified.
+class Validators:
+    def __init__(self, path=VALIDATORS_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.values = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.values = json.load(f)
+
+    def request_headers(self, key):
+        v = self.values.get(key, {})
+        headers = {}
+        if v.get('ETag'):
+            headers['If-None-Match'] = v['ETag']
+        if v.get('Last-Modified'):
+            headers['If-Modified-Since'] = v['Last-Modified']
+        return headers
+
+    def update(self, key, response):
+        v = {name: response.headers[name] for name in ['ETag', 'Last-Modified'] if name in response.headers}
+        with self.lock:
+            if v:
+                self.values[key] = v
+            else:
+                self.values.pop(key, None)
+
+    def save(self):
+        if not self.path or not os.path.isdir(os.path.dirname(self.path)):
+            return
+        with self.lock:
+            with open(self.path + '.tmp', 'w') as f:
+                json.dump(self.values, f, indent=2, sort_keys=True)
+            os.replace(self.path + '.tmp', self.path)
+
+# Content hash and fetch/change timestamps of each downloaded parliament, keyed by parliament id ('1', ..., 'current').
+class ParliamentsManifest:
+    def __init__(self, path=PARLIAMENTS_MANIFEST_FILE):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def get(self, parl_id):
+        return self.entries.get(str(parl_id))
+
+    # Records a fetch of the parliament; returns whether the content differs from the last fetch.
+    def record(self, parl_id, sha256, num_people):
+        entry = self.entries.setdefault(str(parl_id), {})
+        changed = entry.get('sha256') != sha256
+        entry['fetchedAt'] = utc_now()
+        if changed:
+            entry.update(sha256=sha256, changedAt=entry['fetchedAt'], people=num_people)
+        return changed
+
+    # Records a fetch that came back 304 Not Modified. If the parliament has no entry yet (e.g. the manifest was deleted,
+    # but not the validators), a full entry is recorded from its existing JSON file.
+    def touch(self, parl_id, json_filename):
+        entry = self.entries.get(str(parl_id))
+        if entry is None:
+            with open(json_filename) as f:
+                people = json.load(f)['people']
+            self.record(parl_id, content_hash(people), len(people))
+        else:
+            entry['fetchedAt'] = utc_now()
+
+    def save(self):
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(self.path + '.tmp', self.path)
+
+def utc_now():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+def content_hash(obj):
+    return hashlib.sha256(json.dumps(obj, sort_keys=True).encode('utf8')).hexdigest()
+
+# metrics label for an API path: the path without its trailing id, e.g. /Person/GetPersonWebProfile
+def endpoint_label(path):
+    return re.sub(r'/\d+$', '', path)
+
+def decode_json(r, path):
+    with metrics.timer('parleh_json_decode_seconds', endpoint=endpoint_label(path)):
+        return r.json()
+
+def cached_response(cached):
+    import requests
+    from requests.structures import CaseInsensitiveDict
+    r = requests.Response()
+    r.status_code = cached.status
+    r.url = cached.url
+    r.headers = CaseInsensitiveDict(cached.headers)
+    r.encoding = requests.utils.get_encoding_from_headers(r.headers)
+    r._content = cached.body
+    return r
+
+# If given, `throttle` is called before each retry, so that retries also count against the rate limit.
+def make_session(pool_size=10, retries=5, backoff_factor=1, throttle=None):
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    class ThrottledRetry(Retry):
+        def sleep(self, response=None):
+            super().sleep(response)
+            if throttle:
+                throttle()
+
+    retry = ThrottledRetry(total=retries, backoff_factor=backoff_factor, status_forcelist=RETRY_STATUSES,
+                  allowed_methods=['GET'], respect_retry_after_header=True, raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+# The parliament refiner's options in order (1st parliament first), with their ParliamentNumber, or Current for 'Currently in Office'
+def parliament_options(refiner):
+    options = refiner['Options']
+    if options[0]['DisplayNameEn'].startswith('1st'):
+        pass
+    elif options[-1]['DisplayNameEn'].startswith('1st'):
+        options = list(reversed(options))
+    for i, option in enumerate(options):
+        parliament_number = i + 1
+        if option['DisplayNameEn'].startswith(str(parliament_number)):
+            option['ParliamentNumber'] = parliament_number
+        elif option['DisplayNameEn'] == 'Currently in Office':
+            # option['ParliamentNumber'] = parliament_number
+            option['Current'] = True
+        else:
+            raise Exception("Unexpected DisplayNameEn:", option['DisplayNameEn'])
+    return options
+
+def parliament_refiner(refiners):
+    for refiner in refiners:
+        if refiner['Name'] == 'Parliament':
+            return refiner
+    raise Exception("parliament refiner not found")
 
 class Parleh:
     _refiners = None
-    
-    def query_refiners(self):
-        r = requests.get(REFINERS_URL, headers=dict(Accept='application/json'))
+
+    def __init__(self, rate_limit=None, api_url=None, timeout=DEFAULT_TIMEOUT, retries=5, backoff_factor=1,
+                 pool_size=10, validators_file=VALIDATORS_FILE, cache=None, parquet=False, profile_store=False,
+                 streaming=False):
+        self.api_url = (api_url or os.environ.get('PARLEH_API_URL') or PARL_API_URL).rstrip('/')
+        self.timeout = timeout
+        # keep-alive connection pool shared by all requests (and threads), retrying transient errors with exponential backoff;
+        # created on first use, so commands that don't make requests don't import requests
+        self._session = None
+        self._session_args = (pool_size, retries, backoff_factor)
+        self._session_lock = threading.Lock()
+        self.validators = Validators(validators_file)
+        # persistent response cache (pass cache=False to disable); in offline mode all responses come from the cache
+        if cache is None and httpcache.is_enabled():
+            cache = httpcache.ResponseCache(ttls=CACHE_TTLS)
+        self.cache = cache or None
+        # also write parliaments and roles to Parquet datasets in PARQUET_DIR (see columnar.py)
+        self.parquet = parquet
+        # keep profiles in a single SQLite file (see profile_store.py) rather than one JSON file per person
+        self.profile_store = ProfileStore(PROFILE_STORE_FILE) if profile_store else None
+        # parse SearchAndRefine responses incrementally, writing each person to the parliament files as it arrives
+        self.streaming = streaming
+        # maximum requests per second per host (None for no limit)
+        self.rate_limit = rate_limit
+        self._limiters = {}
+        self._limiters_lock = threading.Lock()
+
+    @property
+    def session(self):
+        with self._session_lock:
+            if self._session is None:
+                self._session = make_session(*self._session_args, throttle=lambda: self.throttle(self.api_url))
+        return self._session
+
+    # Changes the rate limit, e.g. between the stages of a single run (see cli.py)
+    def set_rate_limit(self, rate_limit):
+        with self._limiters_lock:
+            self.rate_limit = rate_limit
+            self._limiters = {}
+
+    def throttle(self, url):
+        host = urlsplit(url).netloc
+        with self._limiters_lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = self._limiters[host] = RateLimiter(self.rate_limit)
+        limiter.wait()
+
+    # GET a ParlInfo API path, from the response cache if fresh there. If conditional, sends the validators
+    # from the last download of the same URL, and returns None if the server responds 304 Not Modified.
+    def get(self, path, params=None, headers=None, conditional=False):
+        url = self.api_url + path
+        endpoint = endpoint_label(path)
+        if self.cache:
+            cached = self.cache.get(url, params)
+            if cached is not None:
+                metrics.inc('parleh_requests_total', endpoint=endpoint, status='cached')
+                return cached_response(cached)
+            if self.cache.offline:
+                raise CacheMiss(f"Offline and not cached: {url} {params or ''}")
+
+        key = url + ('?' + urlencode(params) if params else '')
+        headers = dict(headers or {})
+        if conditional:
+            headers.update(self.validators.request_headers(key))
+        with metrics.timer('parleh_throttle_seconds', endpoint=endpoint):
+            self.throttle(url)
+        with metrics.timer('parleh_request_seconds', endpoint=endpoint):
+            r = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+        metrics.inc('parleh_requests_total', endpoint=endpoint, status=r.status_code)
+        metrics.inc('parleh_response_bytes_total', len(r.content), endpoint=endpoint)
+        metrics.observe('parleh_response_size_bytes', len(r.content), buckets=metrics.BYTES_BUCKETS, endpoint=endpoint)
+        if r.status_code == 304:
+            if self.cache:
+                self.cache.touch(url, params)
+            return None
+        r.raise_for_status()
+        self.validators.update(key, r)
+        if self.cache:
+            self.cache.put(url, r.status_code, list(r.headers.items()), r.content, params)
+        return r
+
+    # Same as get, but returns the response body as an iterator of chunks, read as they arrive
+    # (the body is only held in memory in full when it is stored in the response cache).
+    def get_stream(self, path, params=None, headers=None, conditional=False, chunk_size=STREAM_CHUNK_SIZE):
+        url = self.api_url + path
+        endpoint = endpoint_label(path)
+        if self.cache:
+            cached = self.cache.get(url, params)
+            if cached is not None:
+                metrics.inc('parleh_requests_total', endpoint=endpoint, status='cached')
+                return (cached.body[i:i + chunk_size] for i in range(0, len(cached.body), chunk_size))
+            if self.cache.offline:
+                raise CacheMiss(f"Offline and not cached: {url} {params or ''}")
+
+        key = url + ('?' + urlencode(params) if params else '')
+        headers = dict(headers or {})
+        if conditional:
+            headers.update(self.validators.request_headers(key))
+        with metrics.timer('parleh_throttle_seconds', endpoint=endpoint):
+            self.throttle(url)
+        # the time to the response headers; reading the body is timed by the caller, interleaved with parsing it
+        with metrics.timer('parleh_request_seconds', endpoint=endpoint):
+            r = self.session.get(url, params=params, headers=headers, timeout=self.timeout, stream=True)
+        metrics.inc('parleh_requests_total', endpoint=endpoint, status=r.status_code)
+        if r.status_code == 304:
+            r.close()
+            if self.cache:
+                self.cache.touch(url, params)
+            return None
         r.raise_for_status()
+        self.validators.update(key, r)
+
+        def chunks():
+            body = [] if self.cache else None
+            with r:
+                for chunk in r.iter_content(chunk_size):
+                    metrics.inc('parleh_response_bytes_total', len(chunk), endpoint=endpoint)
+                    if body is not None:
+                        body.append(chunk)
+                    yield chunk
+            if body is not None:
+                self.cache.put(url, r.status_code, list(r.headers.items()), b''.join(body), params)
+        return chunks()
+
+    def query_refiners(self):
+        r = self.get(REFINERS_PATH, headers=dict(Accept='application/json'))
         # print("refiners body:", r.text)
-        return r.json()
+        return decode_json(r, REFINERS_PATH)
 
     def refiners(self):
         self._refiners = self._refiners or self.query_refiners()
         return self._refiners
 
     def parliament_refiner(self):
-        for refiner in self.refiners():
-            if refiner['Name'] == 'Parliament':
-                return refiner
-        raise Exception("parliament refiner not found")
+        return parliament_refiner(self.refiners())
 
     def parliament_options(self):
-        refiner = self.parliament_refiner()
-        options = refiner['Options']
-        if options[0]['DisplayNameEn'].startswith('1st'):
-            pass
-        elif options[-1]['DisplayNameEn'].startswith('1st'):
-            options = list(reversed(options))
-        for i, option in enumerate(options):
-            parliament_number = i + 1
-            if option['DisplayNameEn'].startswith(str(parliament_number)):
-                option['ParliamentNumber'] = parliament_number
-            elif option['DisplayNameEn'] == 'Currently in Office':
-                # option['ParliamentNumber'] = parliament_number
-                option['Current'] = True
-            else:
-                raise Exception("Unexpected DisplayNameEn:", option['DisplayNameEn'])
-        return options
+        return parliament_options(self.parliament_refiner())
         
-    def query_people(self, parl_option):
+    # returns None if conditional and unchanged since the last download
+    def query_people(self, parl_option, conditional=False):
         refiner_id = self.parliament_refiner()['RefinerId']
         option_id = parl_option['OptionId']
-        r = requests.get(PERSON_SEARCH_URL, params=dict(refiners=f'{refiner_id}-{option_id},'))
-        r.raise_for_status()
-        return r.json()
+        r = self.get(PERSON_SEARCH_PATH, params=dict(refiners=f'{refiner_id}-{option_id},'), conditional=conditional)
+        return r and decode_json(r, PERSON_SEARCH_PATH)
 
-    def query_profile(self, person_id):
-        r = requests.get(PERSON_PROFILE_URL % person_id)
-        r.raise_for_status()
-        return r.json()
+    # Streaming version of query_people: an iterator of the people, parsed as the response arrives
+    def iter_query_people(self, parl_option, conditional=False):
+        refiner_id = self.parliament_refiner()['RefinerId']
+        option_id = parl_option['OptionId']
+        chunks = self.get_stream(PERSON_SEARCH_PATH, params=dict(refiners=f'{refiner_id}-{option_id},'), conditional=conditional)
+        return chunks and iter_json_array(chunks)
+
+    # returns None if conditional and unchanged since the last download
+    def query_profile(self, person_id, conditional=False):
+        r = self.get(PERSON_PROFILE_PATH % person_id, conditional=conditional)
+        return r and decode_json(r, PERSON_PROFILE_PATH)
         
     def iter_people(self, people, parl_id):    
         for d in people:
@@ -112,42 +458,145 @@ class Parleh:
             yield row
 
     def people_df(self, people, parl_id):
-        df = pd.DataFrame(self.iter_people(people, parl_id), columns= REGULAR_COLS + DEATH_COLS)
+        import pandas as pd
+        # people without a Death record get missing values in the death columns
+        df = pd.DataFrame.from_records(people, columns=REGULAR_COLS)
+        deaths = pd.DataFrame.from_records([d['Death'] or {} for d in people], columns=DEATH_COLS)
+        df = pd.concat([df, deaths], axis=1).apply(trim_col)
         for col in DATE_COLS:
-            df[col] = pd.to_datetime(df[col]).dt.date
+            df[col] = to_dates(df[col])
         return df.set_index('PersonId')
 
-    def download_parliament(self, parl_option):
-        parl_num = parl_option.get('ParliamentNumber')
-        parl_id = 'current' if parl_option.get('Current') else str(parl_num)
+    # A person's row of the parliament CSV file, as in people_df
+    def person_row(self, person):
+        death = person['Death'] or {}
+        row = PersonRow._make([trim(person.get(col)) for col in REGULAR_COLS] + [trim(death.get(col)) for col in DEATH_COLS])
+        return row._replace(**{col: iso_date(getattr(row, col)) for col in DATE_COLS if isinstance(getattr(row, col), str)})
+
+    def parliament_id(self, parl_option):
+        return 'current' if parl_option.get('Current') else str(parl_option.get('ParliamentNumber'))
+
+    def have_parliament_files(self, parl_id):
+        return all(os.path.exists(PARLIAMENTS_DIR + f'parliament-{parl_id}-people.{ext}') for ext in ['json', 'csv'])
+
+    # Returns whether the parliament's files were (re)written.
+    # If a manifest is given, files are only rewritten if the content hash differs from the last download.
+    def download_parliament(self, parl_option, manifest=None):
+        if self.streaming:
+            return self.stream_parliament(parl_option, manifest)
+        parl_id = self.parliament_id(parl_option)
+
+        json_filename = PARLIAMENTS_DIR + f'parliament-{parl_id}-people.json'
+        csv_filename = PARLIAMENTS_DIR + f'parliament-{parl_id}-people.csv'
+        have_files = self.have_parliament_files(parl_id)
 
         print(f"Downloading people for parliament {parl_id}...")
-        people = self.query_people(parl_option)
+        people = self.query_people(parl_option, conditional=have_files)
+        if people is None:
+            print(f"  Parliament {parl_id} not modified, keeping existing files")
+            if manifest is not None:
+                manifest.touch(parl_id, json_filename)
+            return False
+
+        if manifest is not None:
+            changed = manifest.record(parl_id, content_hash(people), len(people))
+            if have_files and not changed:
+                print(f"  Parliament {parl_id} unchanged, keeping existing files")
+                return False
 
-        filename = PARLIAMENTS_DIR + f'parliament-{parl_id}-people.json'
+        metrics.inc('parleh_records_total', len(people), kind='people')
         to_save = {'parliament': parl_id, 'people': people}
-        with open(filename, 'w') as f:
-            json.dump(to_save, f, indent=2)
+        with metrics.timer('parleh_stage_seconds', stage='write_parliament_json'):
+            with open(json_filename, 'w') as f:
+                json.dump(to_save, f, indent=2)
+
+        with metrics.timer('parleh_stage_seconds', stage='people_df'):
+            df = self.people_df(people, parl_id)
+        with metrics.timer('parleh_stage_seconds', stage='write_parliament_csv'):
+            df.to_csv(csv_filename, encoding='utf8')
+        if self.parquet:
+            with metrics.timer('parleh_stage_seconds', stage='write_parliament_parquet'):
+                columnar.write_parliament(df, parl_id, PARQUET_DIR)
+        return True
+
+    # Streaming version of download_parliament, writing the same files without holding the parliament in memory.
+    # Files are written to temporary files alongside, which replace the existing ones if the content changed.
+    def stream_parliament(self, parl_option, manifest=None):
+        parl_id = self.parliament_id(parl_option)
+
+        json_filename = PARLIAMENTS_DIR + f'parliament-{parl_id}-people.json'
+        csv_filename = PARLIAMENTS_DIR + f'parliament-{parl_id}-people.csv'
+        have_files = self.have_parliament_files(parl_id)
+
+        print(f"Streaming people for parliament {parl_id}...")
+        people = self.iter_query_people(parl_option, conditional=have_files)
+        if people is None:
+            print(f"  Parliament {parl_id} not modified, keeping existing files")
+            if manifest is not None:
+                manifest.touch(parl_id, json_filename)
+            return False
 
-        filename = PARLIAMENTS_DIR + f'parliament-{parl_id}-people.csv'
-        df = self.people_df(people, parl_id)
-        df.to_csv(filename, encoding='utf8')
+        writer = ParliamentWriter(parl_id, json_filename, csv_filename, PersonRow, self.person_row)
+        try:
+            # reading, parsing and writing are interleaved, so are timed together
+            with metrics.timer('parleh_stage_seconds', stage='stream_parliament'):
+                for person in people:
+                    writer.add(person)
+        except BaseException:
+            writer.discard()
+            raise
+        metrics.inc('parleh_records_total', len(writer), kind='people')
+
+        if manifest is not None:
+            changed = manifest.record(parl_id, writer.hash.hexdigest(), len(writer))
+            if have_files and not changed:
+                print(f"  Parliament {parl_id} unchanged, keeping existing files")
+                writer.discard()
+                return False
+
+        writer.commit()
+        if self.parquet:
+            with metrics.timer('parleh_stage_seconds', stage='write_parliament_parquet'):
+                df = self.read_parliament_csv(parl_id, index_col='PersonId').drop(columns='parliament')
+                columnar.write_parliament(df, parl_id, PARQUET_DIR)
+        return True
 
-    def download_all_parliaments(self, start_parl, end_parl, include_current=False):
+    # Downloads the selected parliaments, returning the ids of those whose files were (re)written.
+    # In incremental mode, historical parliaments already recorded in the manifest are not fetched again;
+    # only the current and latest parliaments (and any missing ones) are fetched, and rewritten only if changed.
+    def download_all_parliaments(self, start_parl, end_parl, include_current=False, incremental=False):
+        manifest = ParliamentsManifest()
+        selected = []
         for parl_option in self.parliament_options():
             is_current = parl_option.get('Current', False)
             parl_num = parl_option.get('ParliamentNumber')
             if (is_current and include_current) or (parl_num is not None and parl_num >= start_parl and parl_num <= end_parl):
-                self.download_parliament(parl_option)
-    
-    def read_parliament_csv(self, parl_id):
+                selected.append(parl_option)
+        latest_num = max([o['ParliamentNumber'] for o in selected if 'ParliamentNumber' in o], default=None)
+
+        changed = []
+        for parl_option in selected:
+            parl_id = self.parliament_id(parl_option)
+            is_historical = not parl_option.get('Current') and parl_option.get('ParliamentNumber') != latest_num
+            if incremental and is_historical and manifest.get(parl_id) and self.have_parliament_files(parl_id):
+                continue
+            if self.download_parliament(parl_option, manifest):
+                changed.append(parl_id)
+        manifest.save()
+        self.validators.save()
+        print(f"Parliaments changed: {', '.join(changed) or 'none'}")
+        return changed
+
+    def read_parliament_csv(self, parl_id, **kwargs):
+        import pandas as pd
         path = os.path.join(PARLIAMENTS_DIR, f'parliament-{parl_id}-people.csv')
         print("reading from:", path)
-        df = pd.read_csv(path, encoding='utf8')
+        df = pd.read_csv(path, encoding='utf8', **kwargs)
         df.insert(0, 'parliament', parl_id)
         return df
 
     def read_all_parliament_csvs(self, start_parl, end_parl, include_current=False):
+        import pandas as pd
         dfs = []
         for parl_num in range(start_parl, end_parl + 1):
             df = self.read_parliament_csv(parl_num)
@@ -159,74 +608,202 @@ class Parleh:
 
         return pd.concat(dfs)
 
-    def combine_parliament_csvs(self, start_parl, end_parl, include_current=False):
+    # If `changed` is given (a list of parliament ids) and the combined CSV exists, only the rows for those parliaments are replaced.
+    def combine_parliament_csvs(self, start_parl, end_parl, include_current=False, changed=None):
+        if changed is not None and os.path.exists(COMBINED_PARLIAMENTS_FILE):
+            if self.streaming and changed:
+                self.append_parliament_csvs(start_parl, end_parl, include_current)
+            else:
+                self.patch_combined_parliaments_csv(start_parl, end_parl, include_current, changed)
+            return
+        if self.streaming:
+            self.append_parliament_csvs(start_parl, end_parl, include_current)
+            return
         print(f"Combining CSV data for parliaments {start_parl} to {end_parl}...")
-        df = self.read_all_parliament_csvs(start_parl, end_parl, include_current)
-        df.to_csv(PARLIAMENTS_DIR + 'all_parliaments.csv', index=False, encoding='utf8')
-
-    def read_combined_parliaments_csv(self):
-        return pd.read_csv(PARLIAMENTS_DIR + 'all_parliaments.csv', encoding='utf8')
-
-    def download_profile(self, person_id, person):
-        filename = f"{PEOPLE_DIR}{person_id}-{person['LastName']},{person['UsedFirstName'].replace(' ', '_')}.json"
-        if os.path.exists(filename):
+        with metrics.timer('parleh_stage_seconds', stage='combine_parliaments'):
+            df = self.read_all_parliament_csvs(start_parl, end_parl, include_current)
+            df.to_csv(COMBINED_PARLIAMENTS_FILE, index=False, encoding='utf8')
+
+    # Parliaments that changed, or are missing from the combined CSV (e.g. newly selected), are read from their own CSV files.
+    def patch_combined_parliaments_csv(self, start_parl, end_parl, include_current, changed):
+        import pandas as pd
+        # read everything as text, so unchanged rows are written back exactly as they were
+        text_opts = dict(dtype=str, keep_default_na=False)
+        combined = self.read_combined_parliaments_csv(**text_opts)
+        parl_ids = [str(n) for n in range(start_parl, end_parl + 1)] + (['current'] if include_current else [])
+        missing = [parl_id for parl_id in parl_ids if parl_id not in set(combined['parliament'])]
+        patched = [parl_id for parl_id in parl_ids if parl_id in changed or parl_id in missing]
+        if not patched:
+            print("No parliaments changed, keeping combined CSV")
+            return
+        print(f"Patching combined CSV data for parliaments: {', '.join(patched)}...")
+        dfs = []
+        for parl_id in parl_ids:
+            if parl_id in patched:
+                dfs.append(self.read_parliament_csv(parl_id, **text_opts))
+            else:
+                dfs.append(combined[combined['parliament'] == parl_id])
+        df = pd.concat(dfs)
+        df.to_csv(COMBINED_PARLIAMENTS_FILE + '.tmp', index=False, encoding='utf8')
+        os.replace(COMBINED_PARLIAMENTS_FILE + '.tmp', COMBINED_PARLIAMENTS_FILE)
+
+    # Streaming version of combine_parliament_csvs: appends the rows of each parliament CSV file to the combined file as text.
+    def append_parliament_csvs(self, start_parl, end_parl, include_current=False):
+        print(f"Appending CSV data for parliaments {start_parl} to {end_parl} to {COMBINED_PARLIAMENTS_FILE}...")
+        parl_ids = [str(n) for n in range(start_parl, end_parl + 1)] + (['current'] if include_current else [])
+        with metrics.timer('parleh_stage_seconds', stage='combine_parliaments'), \
+                open(COMBINED_PARLIAMENTS_FILE + '.tmp', 'w', encoding='utf8', newline='') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            for i, parl_id in enumerate(parl_ids):
+                append_parliament_csv(writer, PARLIAMENTS_DIR + f'parliament-{parl_id}-people.csv', parl_id, write_header=i == 0)
+        os.replace(COMBINED_PARLIAMENTS_FILE + '.tmp', COMBINED_PARLIAMENTS_FILE)
+
+    def read_combined_parliaments_csv(self, **kwargs):
+        import pandas as pd
+        return pd.read_csv(COMBINED_PARLIAMENTS_FILE, encoding='utf8', **kwargs)
+
+    # Writes the Parquet partition of each parliament from its existing CSV file.
+    def write_parliaments_parquet(self, start_parl, end_parl, include_current=False):
+        parl_ids = [str(n) for n in range(start_parl, end_parl + 1)] + (['current'] if include_current else [])
+        for parl_id in parl_ids:
+            df = self.read_parliament_csv(parl_id, index_col='PersonId').drop(columns='parliament')
+            columnar.write_parliament(df, parl_id, PARQUET_DIR)
+
+    # Typed equivalent of read_all_parliament_csvs (all parliaments by default), from the Parquet dataset.
+    def read_parliaments_parquet(self, parl_ids=None, columns=None):
+        return columnar.read_parliaments(PARQUET_DIR, parl_ids, columns)
+
+    def profile_filename(self, person_id, person):
+        return f"{PEOPLE_DIR}{person_id}-{person['LastName']},{person['UsedFirstName'].replace(' ', '_')}.json"
+
+    def have_profile(self, person_id, person):
+        if self.profile_store:
+            return person_id in self.profile_store
+        return os.path.exists(self.profile_filename(person_id, person))
+
+    # With refresh, re-fetches existing profiles, but only rewrites those that have changed.
+    def download_profile(self, person_id, person, refresh=False):
+        filename = self.profile_filename(person_id, person)
+        exists = self.have_profile(person_id, person)
+        if exists and not refresh:
             return False
         print(f"Fetching profile {person_id}...")
-        d = self.query_profile(person_id)
+        d = self.query_profile(person_id, conditional=exists)
+        if d is None:
+            metrics.inc('parleh_records_total', kind='profile_unchanged')
+            return False
+        metrics.inc('parleh_records_total', kind='profile')
+        if self.profile_store:
+            with metrics.timer('parleh_stage_seconds', stage='store_profile'):
+                return self.profile_store.upsert(person_id, os.path.basename(filename), d)
         print(f"  Writing to {filename}...")
-        with open(filename, 'w') as f:
-            json.dump(d, f, indent=2)
+        # write to a temporary file first, so an interrupted run never leaves a truncated profile to be skipped next time
+        with metrics.timer('parleh_stage_seconds', stage='write_profile'):
+            with open(filename + '.tmp', 'w') as f:
+                json.dump(d, f, indent=2)
+            os.replace(filename + '.tmp', filename)
         return True
 
-    def download_all_profiles(self):
+    def download_all_profiles(self, concurrency=1, refresh=False, progress_every=100):
+        from requests.exceptions import RequestException
         df = self.read_combined_parliaments_csv()[['PersonId', 'LastName', 'UsedFirstName']]
         df = df.drop_duplicates().set_index('PersonId').sort_index()
         # df = df[:20]
 
         print("Downloading profiles for:")
         print(df)
-        for person_id, person in df.iterrows():
-            try:
-                self.download_profile(person_id, person)
-            except HTTPError as err:
-                print(f"  *** Error: {err}")
+
+        # skip existing files up front, so only actual downloads occupy the workers
+        people = [(person_id, person) for person_id, person in df.iterrows()
+                  if refresh or not self.have_profile(person_id, person)]
+        skipped = len(df) - len(people)
+        print(f"{skipped} profiles already downloaded, {len(people)} to fetch with concurrency {concurrency}")
+
+        fetched = 0
+        errors = {}
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            futures = {executor.submit(self.download_profile, person_id, person, refresh): person_id
+                       for person_id, person in people}
+            for i, future in enumerate(as_completed(futures), 1):
+                person_id = futures[future]
+                try:
+                    if future.result():
+                        fetched += 1
+                    else:
+                        skipped += 1
+                # ValueError: a truncated or non-JSON body (JSONDecodeError is a subclass)
+                except (RequestException, CacheMiss, ValueError) as err:
+                    print(f"  *** Error fetching profile {person_id}: {err}")
+                    metrics.inc('parleh_errors_total', kind=type(err).__name__)
+                    errors[person_id] = err
+                if i % progress_every == 0 or i == len(futures):
+                    print(f"Progress: {i}/{len(futures)} done, {fetched} fetched, {len(errors)} errors")
+        self.validators.save()
+
+        print(f"Profiles fetched: {fetched}, skipped: {skipped}, errors: {len(errors)}")
+        for person_id, err in sorted(errors.items()):
+            print(f"  {person_id}: {err}")
+        return fetched, skipped, errors
 
     # Match people .json files
     def person_files(self):
-        pattern = re.compile('[0-9]+-.+\.json$')
+        pattern = re.compile(PERSON_FILE_RE)
         matching_files = filter(lambda d: pattern.match(d), os.listdir(PEOPLE_DIR))
         return sorted(matching_files, key=name_suffix)
 
     def person_recs(self, n = None):
+        if self.profile_store:
+            yield from islice(self.profile_store.scan(), n)
+            return
         files = self.person_files()
         for file in files[:n] if n else files:
             with open(os.path.join(PEOPLE_DIR, file)) as f:
                 yield json.load(f)
 
-    def extract_roles(self, role_type):
-        person_cols = ['PersonId', 'LastName', 'UsedFirstName']
-
-        rows = []
-        for rec in self.person_recs():
-            person = {col: rec['Person'][col] for col in person_cols}
-            roles = rec[role_type] or []
-            for role in roles:
-                classes = role.get('Classes')
-                if classes is not None:
-                    class_names = [c['RoleClassNameEn'] for c in classes]
-                    # if None in class_names:
-                    #     print(person, "class names:", class_names)
-                    role['Classes'] = '|'.join(filter(None, class_names))
-
-                # MP info is a dict with keys OccupationTypeEn, OccupationTypeFr. Use the former.
-                mp_info = role.get('MemberOfParliament')
-                if mp_info is not None:
-                    role['MemberOfParliament'] = mp_info['OccupationTypeEn']
-                    
-                row = {**person, **role}
-                rows.append(row)
-                    
+    # Yields (role_type, row) pairs for the given role types from all profiles, in person_files() order.
+    # With more than one worker (None for one per CPU), shards of files are parsed by a pool of processes.
+    # Rows are flattened (see roles.flatten_role) unless flatten=False.
+    def role_rows(self, role_types, workers=1, shard_size=100, flatten=True):
+        role_types = list(role_types)
+        workers = workers or os.cpu_count()
+        if self.profile_store:
+            if workers == 1:
+                for rec in self.profile_store.scan():
+                    yield from record_role_rows(rec, role_types, flatten)
+                return
+            keys = self.profile_store.ids()
+            worker = partial(store_shard_role_rows, store_path=PROFILE_STORE_FILE, role_types=role_types, flatten=flatten)
+        else:
+            keys = [os.path.join(PEOPLE_DIR, file) for file in self.person_files()]
+            if workers == 1:
+                for path in keys:
+                    yield from profile_role_rows(path, role_types, flatten)
+                return
+            worker = partial(shard_role_rows, role_types=role_types, flatten=flatten)
+
+        shards = [keys[i:i + shard_size] for i in range(0, len(keys), shard_size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # map returns results in shard order, so the output is the same as with a single worker
+            for rows in executor.map(worker, shards):
+                yield from rows
+
+    # Copies profiles from the per-file layout into the profile store.
+    def import_profiles_to_store(self):
+        changed = self.profile_store.import_files(PEOPLE_DIR, self.person_files())
+        print(f"Imported {changed} new or changed profiles into {PROFILE_STORE_FILE} ({len(self.profile_store)} in total)")
+
+    # Writes the profile store out to the per-file layout, e.g. for the people.zip archive.
+    def export_profiles_from_store(self):
+        count = self.profile_store.export(PEOPLE_DIR)
+        print(f"Exported {count} profiles from {PROFILE_STORE_FILE} to {PEOPLE_DIR}")
+
+    def extract_roles(self, role_type, workers=1):
+        import pandas as pd
+        person_cols = PERSON_COLS
+
+        rows = [row for _, row in self.role_rows([role_type], workers, flatten=False)]
         df = pd.DataFrame(rows) if len(rows) > 0 else pd.DataFrame(rows, columns=person_cols)
+        flatten_role_cols(df)
         # print("df:", df)
         # since run on 2021-09-08, RoleId, PersonRoleId, and StartDate are not available for Education roles
         df = df.sort_values([col for col in ['LastName', 'UsedFirstName', 'PersonId', 'StartDate', 'GraduationYear', 'RoleId'] if col in df.columns])
@@ -234,3 +811,48 @@ class Parleh:
         cleanup(df)
         df = df.drop_duplicates()
         return df
+
+    # Extracts all role types in a single pass over the profiles, streaming rows into one CSV file per role type.
+    def extract_all_roles(self, role_types=ROLE_TYPES, out_dir=PEOPLE_DIR, chunk_size=50000, workers=1):
+        writers = {role_type: RoleTableWriter(os.path.join(out_dir, filename), chunk_size)
+                   for role_type, filename in role_types.items()}
+        # parsing happens in the worker processes; this times the whole pass, as seen from here
+        with metrics.timer('parleh_stage_seconds', stage='extract_roles'):
+            for role_type, row in self.role_rows(role_types, workers):
+                writers[role_type].add(row)
+
+        for role_type, writer in writers.items():
+            written = writer.close()
+            metrics.inc('parleh_records_total', writer.count, kind='role', role_type=role_type)
+            print(f"{role_type}: {written} rows ({writer.count - written} duplicates dropped) written to {writer.path}")
+        if self.parquet:
+            self.write_roles_parquet(role_types, out_dir)
+
+    # Brings parliaments.zip and people.zip up to date with the parliament files and profiles (see archives.py).
+    # With the profile store, profiles are archived from the per-file layout, so export them first (profiles.py export).
+    def update_archives(self, compression='deflate', level=None, workers=None):
+        for zip_path, directory, pattern in [(PARLIAMENTS_ARCHIVE, PARLIAMENTS_DIR, PARLIAMENT_FILE_RE),
+                                             (PEOPLE_ARCHIVE, PEOPLE_DIR, PERSON_FILE_RE)]:
+            members = archives.directory_members(directory, re.compile(pattern))
+            print(f"Updating {zip_path} ({len(members)} files, {compression})...")
+            with metrics.timer('parleh_stage_seconds', stage='update_archive'):
+                changed, copied, removed = archives.update_zip(zip_path, members, compression, level, workers)
+            metrics.inc('parleh_archive_members_total', changed, archive=os.path.basename(zip_path), action='compressed')
+            metrics.inc('parleh_archive_members_total', copied, archive=os.path.basename(zip_path), action='copied')
+            print(f"  {changed} added or updated, {copied} unchanged, {removed} removed")
+
+    def write_people_parquet(self):
+        columnar.write_people((rec['Person'] for rec in self.person_recs()), PARQUET_DIR)
+
+    def read_people_parquet(self, columns=None):
+        return columnar.read_people(PARQUET_DIR, columns)
+
+    # Writes the Parquet partition of each role type from its existing CSV file.
+    def write_roles_parquet(self, role_types=ROLE_TYPES, csv_dir=PEOPLE_DIR):
+        import pandas as pd
+        for role_type, filename in role_types.items():
+            df = pd.read_csv(os.path.join(csv_dir, filename), encoding='utf8')
+            columnar.write_roles(df, role_type, PARQUET_DIR)
+
+    def read_roles_parquet(self, role_type, columns=None):
+        return columnar.read_roles(role_type, PARQUET_DIR, columns)
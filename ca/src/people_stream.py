@@ -0,0 +1,138 @@
+import codecs
+import csv
+import hashlib
+import json
+import os
+import re
+from textwrap import indent
+
+# Streaming counterpart of Parleh.people_df and the parliament files written by download_parliament:
+# a SearchAndRefine response (a JSON array of people) is parsed one person at a time as it arrives,
+# and each person is written straight to the raw JSON file and, as a compact row of the CSV columns, to the CSV file,
+# so a parliament is never held in memory as a whole. The files are the same, byte for byte, as the non-streaming ones.
+
+WHITESPACE_RE = re.compile(r'[ \t\n\r]*')
+NUMBER_CHARS_RE = re.compile(r'[-+0-9.eE]*')
+DECODER = json.JSONDecoder()
+
+# Yields the elements of a top-level JSON array, given its text in chunks of bytes (UTF-8).
+def iter_json_array(chunks):
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    buf = ''
+    pos = 0
+    state = 'start'  # expecting '[', then the first element or ']', then ',' or ']', then another element
+    final = False
+    chunks = iter(chunks)
+    while not final:
+        chunk = next(chunks, None)
+        final = chunk is None
+        buf = buf[pos:] + decoder.decode(chunk or b'', final)
+        pos = 0
+        while True:
+            pos = WHITESPACE_RE.match(buf, pos).end()
+            if pos == len(buf):
+                break
+            if state == 'start':
+                if buf[pos] != '[':
+                    raise ValueError(f"Expected a JSON array, got: {buf[pos:pos + 20]!r}")
+                pos += 1
+                state = 'first'
+            elif state == 'next':
+                if buf[pos] == ']':
+                    return
+                if buf[pos] != ',':
+                    raise ValueError(f"Expected ',' or ']' in JSON array, got: {buf[pos:pos + 20]!r}")
+                pos += 1
+                state = 'element'
+            else:
+                if state == 'first' and buf[pos] == ']':
+                    return
+                try:
+                    obj, end = DECODER.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    break  # incomplete element: wait for the next chunk
+                # a number running to the end of the buffer may continue in the next chunk
+                if not final and NUMBER_CHARS_RE.match(buf, end).end() == len(buf) and buf[pos] not in '{["':
+                    break
+                yield obj
+                pos = end
+                state = 'next'
+    if state != 'next' or buf[pos:].strip():
+        raise ValueError("Truncated JSON array")
+
+# Incremental equivalent of parleh.content_hash(people), hashing the people one at a time
+class PeopleHash:
+    def __init__(self):
+        self.sha256 = hashlib.sha256(b'[')
+        self.count = 0
+
+    def add(self, person):
+        if self.count:
+            self.sha256.update(b', ')
+        self.sha256.update(json.dumps(person, sort_keys=True).encode('utf8'))
+        self.count += 1
+
+    def hexdigest(self):
+        h = self.sha256.copy()
+        h.update(b']')
+        return h.hexdigest()
+
+# CSV cell text, as written by DataFrame.to_csv
+def cell(v):
+    return '' if v is None else str(v)
+
+# Writes a parliament's JSON and CSV files as its people arrive, to temporary files that replace the existing ones on commit().
+class ParliamentWriter:
+    # `project` maps a person to their CSV row, a namedtuple of type `row_type`
+    def __init__(self, parl_id, json_filename, csv_filename, row_type, project):
+        self.parl_id = parl_id
+        self.json_filename = json_filename
+        self.csv_filename = csv_filename
+        self.row_type = row_type
+        self.project = project
+        self.hash = PeopleHash()
+        self.json_file = open(json_filename + '.tmp', 'w')
+        self.csv_file = open(csv_filename + '.tmp', 'w', encoding='utf8', newline='')
+        self.csv_writer = csv.writer(self.csv_file, lineterminator='\n')
+        # same layout as json.dump({'parliament': ..., 'people': [...]}, indent=2)
+        self.json_file.write('{\n  "parliament": ' + json.dumps(parl_id) + ',\n  "people": [')
+        self.csv_writer.writerow(self.row_type._fields)
+
+    def __len__(self):
+        return self.hash.count
+
+    def add(self, person):
+        self.json_file.write(('\n' if not self.hash.count else ',\n') + indent(json.dumps(person, indent=2), '    '))
+        self.hash.add(person)
+        self.csv_writer.writerow([cell(v) for v in self.project(person)])
+
+    def close(self):
+        if self.json_file.closed:
+            return
+        self.json_file.write('\n  ]\n}' if self.hash.count else ']\n}')
+        self.json_file.close()
+        self.csv_file.close()
+
+    def commit(self):
+        self.close()
+        os.replace(self.json_filename + '.tmp', self.json_filename)
+        os.replace(self.csv_filename + '.tmp', self.csv_filename)
+
+    def discard(self):
+        self.close()
+        for filename in [self.json_filename, self.csv_filename]:
+            if os.path.exists(filename + '.tmp'):
+                os.remove(filename + '.tmp')
+
+# Appends a parliament CSV file to the combined CSV writer, each row prefixed with its parliament id
+# (the same rows combine_parliament_csvs writes through pandas, without loading the files into DataFrames).
+def append_parliament_csv(writer, csv_filename, parl_id, write_header):
+    with open(csv_filename, encoding='utf8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        if write_header:
+            writer.writerow(['parliament'] + header)
+        for row in reader:
+            writer.writerow([parl_id] + row)
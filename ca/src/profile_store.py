@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+# Single-file store of person profiles (the GetPersonWebProfile JSON), keyed by PersonId,
+# as an alternative to one data/people/ID-LAST,FIRST.json file per person.
+# `filename` is the name the profile has in the per-file layout, used for ordering (like Parleh.person_files) and export.
+class ProfileStore:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('''CREATE TABLE IF NOT EXISTS profiles (
+            person_id INTEGER PRIMARY KEY, filename TEXT NOT NULL, sort_name TEXT NOT NULL,
+            profile TEXT NOT NULL, sha256 TEXT NOT NULL, updated_at TEXT NOT NULL)''')
+        self.db.execute('CREATE INDEX IF NOT EXISTS profiles_sort_name ON profiles (sort_name, person_id)')
+        self.db.commit()
+
+    def __contains__(self, person_id):
+        with self.lock:
+            return self.db.execute('SELECT 1 FROM profiles WHERE person_id = ?', (int(person_id),)).fetchone() is not None
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM profiles').fetchone()[0]
+
+    def get(self, person_id):
+        with self.lock:
+            row = self.db.execute('SELECT profile FROM profiles WHERE person_id = ?', (int(person_id),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # Inserts or replaces the profile in a single transaction; returns whether it was new or changed.
+    def upsert(self, person_id, filename, profile):
+        text = json.dumps(profile, separators=(',', ':'))
+        sha256 = hashlib.sha256(text.encode('utf8')).hexdigest()
+        now = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        with self.lock, self.db:
+            row = self.db.execute('SELECT sha256 FROM profiles WHERE person_id = ?', (int(person_id),)).fetchone()
+            if row and row[0] == sha256:
+                return False
+            self.db.execute('INSERT OR REPLACE INTO profiles VALUES (?, ?, ?, ?, ?, ?)',
+                            (int(person_id), filename, sort_name(filename), text, sha256, now))
+        return True
+
+    # PersonIds in the same order as Parleh.person_files
+    def ids(self):
+        return [row[0] for row in self.db.execute('SELECT person_id FROM profiles ORDER BY sort_name, person_id')]
+
+    # Yields profiles in the same order as Parleh.person_recs, optionally only those with the given ids.
+    def scan(self, person_ids=None):
+        if person_ids is None:
+            cursor = self.db.execute('SELECT profile FROM profiles ORDER BY sort_name, person_id')
+        else:
+            ids = ','.join(str(int(person_id)) for person_id in person_ids)
+            cursor = self.db.execute(f'SELECT profile FROM profiles WHERE person_id IN ({ids}) ORDER BY sort_name, person_id')
+        for row in cursor:
+            yield json.loads(row[0])
+
+    # Imports profiles from the per-file layout; returns the number added or changed.
+    def import_files(self, in_dir, filenames):
+        changed = 0
+        for filename in filenames:
+            with open(os.path.join(in_dir, filename)) as f:
+                profile = json.load(f)
+            changed += self.upsert(int(filename.split('-')[0]), filename, profile)
+        return changed
+
+    # Writes every profile to the per-file layout, as Parleh.download_profile does without a store.
+    def export(self, out_dir):
+        count = 0
+        for filename, text in self.db.execute('SELECT filename, profile FROM profiles ORDER BY sort_name, person_id'):
+            path = os.path.join(out_dir, filename)
+            with open(path + '.tmp', 'w') as f:
+                json.dump(json.loads(text), f, indent=2)
+            os.replace(path + '.tmp', path)
+            count += 1
+        return count
+
+    def close(self):
+        self.db.close()
+
+# same key as parleh.name_suffix, which person_files sorts by
+def sort_name(filename):
+    return filename.split('-')[-1]
@@ -0,0 +1,10 @@
+import argparse
+from cli import main
+
+# same as `./parleh import-profiles` or `./parleh export-profiles` (see cli.py)
+parser = argparse.ArgumentParser(description='Copy profiles between the per-person JSON files and the single-file profile store.')
+parser.add_argument('direction', choices=['import', 'export'],
+                    help='import: JSON files into the store; export: store to JSON files')
+
+args = parser.parse_args()
+main([f'{args.direction}-profiles'])
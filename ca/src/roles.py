@@ -0,0 +1,172 @@
+import csv
+import hashlib
+import heapq
+import json
+import os
+import tempfile
+
+PERSON_COLS = ['PersonId', 'LastName', 'UsedFirstName']
+# since run on 2021-09-08, RoleId, PersonRoleId, and StartDate are not available for Education roles
+SORT_COLS = ['LastName', 'UsedFirstName', 'PersonId', 'StartDate', 'GraduationYear', 'RoleId']
+INDEX_COLS = ['PersonRoleId', 'PersonId']
+UNSUPPORTED_COLS = ['Documents', 'Senator']
+
+# role fields of a person record, and the CSV file each is extracted to
+ROLE_TYPES = {
+    'Education': 'education.csv',
+    'FederalExperience': 'federal_experience.csv',
+    'MilitaryExperience': 'military_experience.csv',
+    'MunicipalExperience': 'municipal_experience.csv',
+    'ProvincialExperience': 'provincial_experience.csv',
+}
+
+def flatten_role(person, role):
+    classes = role.get('Classes')
+    if classes is not None:
+        class_names = [c['RoleClassNameEn'] for c in classes]
+        role['Classes'] = '|'.join(filter(None, class_names))
+
+    # MP info is a dict with keys OccupationTypeEn, OccupationTypeFr. Use the former.
+    mp_info = role.get('MemberOfParliament')
+    if mp_info is not None:
+        role['MemberOfParliament'] = mp_info['OccupationTypeEn']
+
+    return {**person, **role}
+
+def record_role_rows(rec, role_types, flatten=True):
+    person = {col: rec['Person'][col] for col in PERSON_COLS}
+    return [(role_type, flatten_role(person, role) if flatten else {**person, **role})
+            for role_type in role_types for role in rec[role_type] or []]
+
+def profile_role_rows(path, role_types, flatten=True):
+    with open(path) as f:
+        return record_role_rows(json.load(f), role_types, flatten)
+
+# Process pool worker: parses a shard of profile files, returning their (role_type, row) pairs in file order.
+def shard_role_rows(paths, role_types, flatten=True):
+    rows = []
+    for path in paths:
+        rows.extend(profile_role_rows(path, role_types, flatten))
+    return rows
+
+# Process pool worker: as shard_role_rows, for a shard of PersonIds in a ProfileStore.
+def store_shard_role_rows(person_ids, store_path, role_types, flatten=True):
+    from profile_store import ProfileStore
+
+    store = ProfileStore(store_path)
+    try:
+        return [row for rec in store.scan(person_ids) for row in record_role_rows(rec, role_types, flatten)]
+    finally:
+        store.close()
+
+# Same as parleh.cleanup, for a single row: drop times from dates, and drop French and unsupported columns.
+def cleanup_row(row):
+    return {
+        col: val[:10] if col.endswith('Date') and isinstance(val, str) else val
+        for col, val in row.items()
+        if not col.endswith('Fr') and col not in UNSUPPORTED_COLS
+    }
+
+# Sorts like DataFrame.sort_values (missing values last); rows that tie are kept in input order by their sequence number.
+def sort_key(item):
+    seq, row = item
+    key = []
+    for col in SORT_COLS:
+        val = row.get(col)
+        key.append((val is None, isinstance(val, str), 0 if val is None else val))
+    key.append(seq)
+    return key
+
+# drop_duplicates compares all columns other than the index, with missing values equal to None
+def dedupe_key(row):
+    return hashlib.sha1(json.dumps({col: val for col, val in row.items() if col not in INDEX_COLS and val is not None},
+                                   sort_keys=True, default=str).encode('utf8')).digest()
+
+def value_kind(val):
+    return 'bool' if isinstance(val, bool) else 'int' if isinstance(val, int) else 'float' if isinstance(val, float) else 'other'
+
+def cell(val):
+    return '' if val is None else str(val)
+
+def float_cell(val):
+    return '' if val is None else str(float(val))
+
+# How DataFrame.to_csv writes a column's values: pandas infers a float column for numbers with missing values
+# (or with any floats), so e.g. a GraduationYear of 1964 is written as 1964.0; other values are written as they are.
+def column_formatter(kinds, has_missing):
+    if kinds and kinds <= {'int', 'float'} and (has_missing or 'float' in kinds):
+        return float_cell
+    return cell
+
+# Writes one role table to CSV incrementally, with the same columns, order and de-duplication as Parleh.extract_roles,
+# while holding at most chunk_size rows in memory: full chunks are sorted and spilled to temporary files,
+# which are merged when the table is closed (only a digest of each distinct row is kept, for de-duplication).
+# Rows are numbered as they are added, so that rows which tie in the sort stay in input order, as with sort_values.
+class RoleTableWriter:
+    def __init__(self, path, chunk_size=50000):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.columns = {}  # insertion-ordered set of all columns seen
+        self.kinds = {}  # column: kinds of its values (see value_kind)
+        self.present = {}  # column: number of rows with a value in it
+        self.rows = []
+        self.spills = []
+        self.count = 0
+
+    def add(self, row):
+        row = cleanup_row(row)
+        for col, val in row.items():
+            self.columns.setdefault(col)
+            if val is not None:
+                self.kinds.setdefault(col, set()).add(value_kind(val))
+                self.present[col] = self.present.get(col, 0) + 1
+        self.rows.append((self.count, row))
+        self.count += 1
+        if len(self.rows) >= self.chunk_size:
+            self.spill()
+
+    def spill(self):
+        self.rows.sort(key=sort_key)
+        f = tempfile.TemporaryFile('w+', encoding='utf8')
+        for item in self.rows:
+            f.write(json.dumps(item) + '\n')
+        f.seek(0)
+        self.spills.append(f)
+        self.rows = []
+
+    def read_spill(self, f):
+        for line in f:
+            yield tuple(json.loads(line))
+
+    def close(self):
+        self.rows.sort(key=sort_key)
+        merged = heapq.merge(*[self.read_spill(f) for f in self.spills], self.rows, key=sort_key)
+
+        columns = list(self.columns) or PERSON_COLS
+        index_cols = [col for col in INDEX_COLS if col in columns]
+        header = index_cols + [col for col in columns if col not in index_cols]
+
+        formatters = [column_formatter(self.kinds.get(col, set()), self.present.get(col, 0) < self.count) for col in header]
+
+        # the same text as print(df.to_csv()) of Parleh.extract_roles, which is how the role CSVs were first written
+        written = 0
+        with open(self.path + '.tmp', 'w', newline='', encoding='utf8') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(header)
+            # like drop_duplicates, keeps the first occurrence of each row, wherever its duplicates are in the sort order
+            seen = set()
+            for _, row in merged:
+                key = dedupe_key(row)
+                if key in seen:
+                    continue
+                seen.add(key)
+                writer.writerow([format(row.get(col)) for col, format in zip(header, formatters)])
+                written += 1
+            f.write('\n')
+        os.replace(self.path + '.tmp', self.path)
+
+        for f in self.spills:
+            f.close()
+        self.spills = []
+        self.rows = []
+        return written
@@ -0,0 +1,89 @@
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+# the repository root, for the shared modules in common/, whichever directory the tests are run from
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+sys.path.insert(0, ROOT_DIR)
+
+# Helpers for the CA tests: a local HTTP server standing in for the ParlInfo API, and a scratch data directory.
+
+# ParlInfo's parliament refiner, with the current parliament and the 1st and 2nd, in the API's (reverse) order
+REFINERS = [{'Name': 'Parliament', 'RefinerId': 4, 'Options': [
+    {'OptionId': 1, 'DisplayNameEn': 'Currently in Office'},
+    {'OptionId': 3, 'DisplayNameEn': '2nd Parliament'},
+    {'OptionId': 2, 'DisplayNameEn': '1st Parliament'}]}]
+
+
+# A SearchAndRefine result, with only the fields the tests look at
+def person(person_id, last_name):
+    return {'PersonId': person_id, 'LastName': last_name, 'UsedFirstName': 'Anne', 'DateOfBirth': '1900-01-02T00:00:00',
+            'ConstituencyEn': '<br>Riding<br>', 'Death': None}
+
+
+# Handler for StubServer: the same people for every parliament, with an ETag, and 304 Not Modified for a matching If-None-Match
+class ParlInfoStub:
+    def __init__(self):
+        self.people = [person(1, 'Smith'), person(2, 'Roy')]
+        self.etag = '"v1"'
+
+    def __call__(self, path, headers):
+        if path.startswith('/Refiner/GetRefiners'):
+            return 200, {'Content-Type': 'application/json'}, json.dumps(REFINERS).encode()
+        if headers.get('If-None-Match') == self.etag:
+            return 304, {'ETag': self.etag}, b''
+        return 200, {'Content-Type': 'application/json', 'ETag': self.etag}, json.dumps(self.people).encode()
+
+
+# Serves GET requests with `handle(path, headers)`, which returns (status, headers, body); records the requests made.
+class StubServer:
+    def __init__(self, handle):
+        self.handle = handle
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub.requests.append((self.path, dict(self.headers)))
+                status, headers, body = stub.handle(self.path, self.headers)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# A scratch copy of the ca directory layout (src/, data/parliaments/, data/people/), with src/ as the working directory,
+# since parleh.py's data paths are relative to it.
+@contextlib.contextmanager
+def data_dir():
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        for d in ['src', 'data/parliaments', 'data/people']:
+            os.makedirs(os.path.join(tmp, d))
+        os.chdir(os.path.join(tmp, 'src'))
+        try:
+            yield tmp
+        finally:
+            os.chdir(cwd)
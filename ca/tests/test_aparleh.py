@@ -0,0 +1,57 @@
+import asyncio
+import importlib.util
+import json
+import os
+import unittest
+
+from support import StubServer, data_dir
+from common.httpcache import ResponseCache
+
+# AsyncParleh: responses served from the cache look like fetched ones, and iter_profiles yields a failed profile's
+# error in its place.
+
+
+def profile_stub(path, headers):
+    person_id = int(path.rsplit('/', 1)[-1])
+    if person_id == 2:
+        return 200, {'Content-Type': 'application/json'}, b'<html>not json</html>'
+    if person_id == 3:
+        return 404, {}, b''
+    return 200, {'Content-Type': 'application/json', 'ETag': f'"p{person_id}"'}, json.dumps({'Person': {'PersonId': person_id}}).encode()
+
+
+@unittest.skipUnless(importlib.util.find_spec('aiohttp'), 'requires aiohttp')
+class AsyncParlehTest(unittest.TestCase):
+    def test_cached_response_headers(self):
+        from aparleh import AsyncParleh
+
+        async def get(p):
+            async with p:
+                return await p.get('/Person/GetPersonWebProfile/1')
+
+        with data_dir() as tmp, StubServer(profile_stub) as server:
+            cache = ResponseCache(os.path.join(tmp, 'http.sqlite'), offline=False)
+            fetched = asyncio.run(get(AsyncParleh(api_url=server.url, cache=cache)))
+            cached = asyncio.run(get(AsyncParleh(api_url=server.url, cache=cache)))
+            self.assertEqual(len(server.requests), 1)
+            self.assertEqual(cached.headers['etag'], fetched.headers['ETag'])
+            self.assertEqual(cached.headers.get('Content-Type'), 'application/json')
+            self.assertEqual(cached.json(), fetched.json())
+            cache.close()
+
+    def test_iter_profiles_errors(self):
+        from aparleh import AsyncParleh, HTTPError
+
+        async def profiles(p):
+            async with p:
+                return {person_id: profile async for person_id, profile in p.iter_profiles([1, 2, 3])}
+
+        with data_dir(), StubServer(profile_stub) as server:
+            results = asyncio.run(profiles(AsyncParleh(api_url=server.url, cache=False, retries=0)))
+            self.assertEqual(results[1], {'Person': {'PersonId': 1}})
+            self.assertIsInstance(results[2], ValueError)
+            self.assertIsInstance(results[3], HTTPError)
+
+
+if __name__ == '__main__':
+    unittest.main()
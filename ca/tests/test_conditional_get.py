@@ -0,0 +1,65 @@
+import contextlib
+import io
+import json
+import os
+import unittest
+
+from support import ParlInfoStub, StubServer, data_dir, person
+import parleh
+from parleh import Parleh
+
+# Conditional GETs of the parliament people: a 200 writes the files and records the ETag, a 304 for the same ETag
+# keeps them as they are, and a changed body rewrites them.
+
+PARLIAMENT_JSON = '../data/parliaments/parliament-1-people.json'
+PARLIAMENT_CSV = '../data/parliaments/parliament-1-people.csv'
+
+
+class ConditionalGetTest(unittest.TestCase):
+    def download(self, server, streaming):
+        p = Parleh(api_url=server.url, cache=False, streaming=streaming)
+        option = next(o for o in p.parliament_options() if o.get('ParliamentNumber') == 1)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            written = p.download_parliament(option)
+        p.validators.save()
+        return written, out.getvalue()
+
+    def read_files(self):
+        with open(PARLIAMENT_JSON) as f, open(PARLIAMENT_CSV) as g:
+            return f.read(), g.read(), os.stat(PARLIAMENT_JSON).st_mtime_ns
+
+    def check(self, streaming):
+        stub = ParlInfoStub()
+        with data_dir(), StubServer(stub) as server:
+            written, _ = self.download(server, streaming)
+            self.assertTrue(written)
+            first = self.read_files()
+            self.assertIn('Smith', first[1])
+            with open(parleh.VALIDATORS_FILE) as f:
+                self.assertEqual([v.get('ETag') for v in json.load(f).values()], ['"v1"'])
+
+            written, out = self.download(server, streaming)
+            self.assertFalse(written)
+            self.assertIn('not modified, keeping existing files', out)
+            self.assertEqual(server.requests[-1][1].get('If-None-Match'), '"v1"')
+            self.assertEqual(self.read_files(), first)
+
+            stub.people = [person(1, 'Smith'), person(3, 'Martin')]
+            stub.etag = '"v2"'
+            written, _ = self.download(server, streaming)
+            self.assertTrue(written)
+            json_text, csv_text, _ = self.read_files()
+            self.assertIn('Martin', csv_text)
+            self.assertNotIn('Roy', csv_text)
+            self.assertEqual([p['PersonId'] for p in json.loads(json_text)['people']], [1, 3])
+
+    def test_conditional_get(self):
+        self.check(streaming=False)
+
+    def test_conditional_get_streaming(self):
+        self.check(streaming=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import contextlib
+import io
+import json
+import os
+import unittest
+
+from support import ParlInfoStub, StubServer, data_dir
+import parleh
+from parleh import Parleh
+
+# Incremental parliament downloads: the manifest and the combined CSV are repaired from the files on disk.
+
+
+class IncrementalTest(unittest.TestCase):
+    def parleh(self, server):
+        return Parleh(api_url=server.url, cache=False)
+
+    def download_all(self, server, incremental):
+        p = self.parleh(server)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return p.download_all_parliaments(1, 2, incremental=incremental)
+
+    def test_not_modified_without_manifest_entry(self):
+        with data_dir(), StubServer(ParlInfoStub()) as server:
+            self.download_all(server, incremental=False)
+            os.remove(parleh.PARLIAMENTS_MANIFEST_FILE)
+
+            # the 1st parliament comes back 304, and is recorded from its file
+            self.assertEqual(self.download_all(server, incremental=True), [])
+            with open(parleh.PARLIAMENTS_MANIFEST_FILE) as f:
+                manifest = json.load(f)
+            self.assertEqual(manifest['1']['people'], 2)
+            self.assertEqual(manifest['1']['sha256'], manifest['2']['sha256'])
+
+            # so the next incremental run doesn't fetch it again (OptionId 2 is the 1st parliament)
+            server.requests.clear()
+            self.download_all(server, incremental=True)
+            self.assertFalse([path for path, _ in server.requests if 'refiners=4-2%2C' in path])
+
+    def test_patch_adds_missing_parliament(self):
+        with data_dir(), StubServer(ParlInfoStub()) as server:
+            self.download_all(server, incremental=False)
+            p = self.parleh(server)
+            with contextlib.redirect_stdout(io.StringIO()):
+                p.combine_parliament_csvs(1, 1)
+                p.combine_parliament_csvs(1, 2, changed=[])
+            combined = p.read_combined_parliaments_csv(dtype=str)
+            self.assertEqual(list(combined['parliament']), ['1', '1', '2', '2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import contextlib
+import csv
+import io
+import json
+import os
+import unittest
+
+from support import data_dir
+import parleh
+from parleh import Parleh
+from roles import ROLE_TYPES
+
+# The role CSVs written by extract_all_roles (in one pass, with chunks spilled to disk) are the same, byte for byte,
+# as print(df.to_csv()) of extract_roles for each role type, which is how they were originally written.
+
+
+def role(i, **fields):
+    return {'PersonRoleId': i, 'RoleId': 100 + i, 'NameEn': 'Mayor', 'NameFr': 'Maire', 'StartDate': '1990-01-01T00:00:00',
+            'EndDate': None, 'IsActing': False, 'Ordinal': 1.0, 'Documents': [],
+            'Classes': [{'RoleClassNameEn': 'Minister'}, {'RoleClassNameEn': None}],
+            'MemberOfParliament': {'OccupationTypeEn': 'MP', 'OccupationTypeFr': 'Député'}, **fields}
+
+
+def education(school, year):
+    return {'SchoolNameLongEn': school, 'SchoolCityEn': 'Montreal, QC', 'FieldOfStudyEn': 'Law', 'GraduationYear': year}
+
+
+PROFILES = [
+    {'Person': {'PersonId': 1, 'LastName': 'Smith', 'UsedFirstName': 'Anne'},
+     'Education': [education('McGill', 1964), education('Laval', None), education('Laval', None)],
+     'FederalExperience': [role(1), role(2, EndDate='2000-01-01T00:00:00', IsActing=None)],
+     'MilitaryExperience': None,
+     'MunicipalExperience': [role(3, PersonRoleId=None, Ordinal=None, Classes=None)],
+     'ProvincialExperience': []},
+    {'Person': {'PersonId': 2, 'LastName': 'Roy', 'UsedFirstName': 'Jean "JP"'},
+     'Education': [education('Bishop\'s', 1850)],
+     'FederalExperience': [role(4, Ordinal=2.5, Extra='x')],
+     'MilitaryExperience': [role(5, RoleId='n/a')],
+     'MunicipalExperience': [role(6, Classes=[])],
+     'ProvincialExperience': [role(7)]},
+    # schools without a year tie on the sort columns, and are given out of alphabetical order
+    {'Person': {'PersonId': 3, 'LastName': 'Roy', 'UsedFirstName': 'Jean "JP"'},
+     'Education': [education('McGill', None), education('Concordia', None), education('Bishop\'s', None),
+                   education('Concordia', None)],
+     'FederalExperience': [], 'MilitaryExperience': [], 'MunicipalExperience': [], 'ProvincialExperience': []},
+]
+
+
+class RoleCsvTest(unittest.TestCase):
+    def test_same_as_extract_roles(self):
+        with data_dir():
+            for rec in PROFILES:
+                person = rec['Person']
+                with open(f"{parleh.PEOPLE_DIR}{person['PersonId']}-{person['LastName']},{person['UsedFirstName']}.json", 'w') as f:
+                    json.dump(rec, f)
+            p = Parleh(cache=False)
+            with contextlib.redirect_stdout(io.StringIO()):
+                p.extract_all_roles(chunk_size=2)
+            for role_type, filename in ROLE_TYPES.items():
+                with self.subTest(role_type=role_type):
+                    with open(os.path.join(parleh.PEOPLE_DIR, filename), newline='', encoding='utf8') as f:
+                        self.assertEqual(f.read(), p.extract_roles(role_type).to_csv() + '\n')
+            with open(os.path.join(parleh.PEOPLE_DIR, ROLE_TYPES['Education']), encoding='utf8') as f:
+                schools = [row['SchoolNameLongEn'] for row in csv.DictReader(f) if row['PersonId'] == '3']
+            self.assertEqual(schools, ['McGill', 'Concordia', "Bishop's"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,288 @@
+# Crawl profile shared by the AU/NZ Scrapy spiders: politeness and throughput tuning, and resumable crawl state.
+#
+# Politeness: requests to each host are limited to CONCURRENT_REQUESTS_PER_DOMAIN at a time, and AutoThrottle adjusts
+# the delay between them to the server's latency. On top of that, AdaptiveConcurrency backs off a host
+# (doubling its delay, or honouring Retry-After) on 429/5xx responses and download errors, and halves its concurrency
+# when the recent error rate or latency is too high, growing it again (up to PARLEH_MAX_CONCURRENCY_PER_DOMAIN) while the host keeps up.
+# ThroughputStats logs pages/sec, items/sec and KB/sec every PARLEH_THROUGHPUT_INTERVAL seconds, and records the averages in the crawl stats.
+# CallbackMetrics records response latency and size per host, and the time spent in each callback, in the metrics registry (metrics.py).
+# All of these are Scrapy settings, so can be overridden with `scrapy runspider -s NAME=VALUE`.
+# The middleware methods take an optional spider argument: Scrapy 2.13 and later don't pass it, earlier versions do.
+#
+# Each spider keeps its pending requests (scheduler queue) and the fingerprints of requests already seen
+# in a job directory (Scrapy's JOBDIR): .crawls/<name> in the repository root.
+# Re-running a crawl that was interrupted (Ctrl-C, `kill`, CLOSESPIDER_TIMEOUT, ...) resumes where it stopped.
+# After a hard crash the queue may be incomplete, but pages fetched before it are still served from the response cache.
+# Once a crawl finishes, its job directory is removed, so the next run starts again from the start URLs,
+# and with the response cache (httpcache.py) only fetches pages that are new or whose TTL has expired.
+#
+# Environment variables:
+#   PARLEH_RESUME=off      don't keep crawl state (every run starts over)
+#   PARLEH_CRAWL_DIR=dir   where to keep it (default: .crawls in the repository root)
+
+import os
+import shutil
+import time
+from collections import defaultdict, deque
+from urllib.parse import urlsplit
+
+from scrapy import Request, signals
+from scrapy.exceptions import NotConfigured
+
+from common import metrics
+
+DEFAULT_CRAWL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '.crawls')
+
+
+def is_resumable():
+    return os.environ.get('PARLEH_RESUME', 'on').lower() not in ['0', 'off', 'false', 'no']
+
+
+def job_dir(name):
+    return os.path.join(os.environ.get('PARLEH_CRAWL_DIR', DEFAULT_CRAWL_DIR), name)
+
+
+# Removes the job directory once the crawl has finished (not when it was interrupted or failed),
+# after the engine has stopped and Scrapy has written out the scheduler and spider state.
+class FinishedJobCleanup:
+    def __init__(self, jobdir):
+        self.jobdir = jobdir
+        self.finished = False
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        jobdir = crawler.settings.get('JOBDIR')
+        if not jobdir:
+            raise NotConfigured
+        ext = cls(jobdir)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(ext.engine_stopped, signal=signals.engine_stopped)
+        return ext
+
+    def spider_closed(self, spider, reason):
+        self.finished = reason == 'finished'
+        if not self.finished:
+            spider.logger.info("Crawl state kept in %s; re-run to resume", self.jobdir)
+
+    def engine_stopped(self):
+        if self.finished:
+            shutil.rmtree(self.jobdir, ignore_errors=True)
+
+
+# responses that mean the server is overloaded or refusing us
+BACKOFF_STATUSES = [429, 500, 502, 503, 504]
+
+POLITENESS_SETTINGS = {
+    'CONCURRENT_REQUESTS': 16,
+    'CONCURRENT_REQUESTS_PER_DOMAIN': 4,
+    'DOWNLOAD_DELAY': 0.25,
+    'AUTOTHROTTLE_ENABLED': True,
+    'AUTOTHROTTLE_START_DELAY': 1.0,
+    'AUTOTHROTTLE_MAX_DELAY': 60.0,
+    'AUTOTHROTTLE_TARGET_CONCURRENCY': 2.0,
+    'RETRY_TIMES': 5,
+    'PARLEH_MAX_CONCURRENCY_PER_DOMAIN': 8,
+    'PARLEH_ADAPT_WINDOW': 20,  # responses per host between concurrency adjustments
+    'PARLEH_MAX_ERROR_RATE': 0.1,
+    'PARLEH_MAX_LATENCY': 10.0,  # seconds
+    'PARLEH_THROUGHPUT_INTERVAL': 30,  # seconds
+}
+
+
+class AdaptiveConcurrency:
+    def __init__(self, crawler):
+        settings = crawler.settings
+        self.crawler = crawler
+        self.max_concurrency = settings.getint('PARLEH_MAX_CONCURRENCY_PER_DOMAIN')
+        self.window = settings.getint('PARLEH_ADAPT_WINDOW')
+        self.max_error_rate = settings.getfloat('PARLEH_MAX_ERROR_RATE')
+        self.max_latency = settings.getfloat('PARLEH_MAX_LATENCY')
+        self.max_delay = settings.getfloat('AUTOTHROTTLE_MAX_DELAY')
+        self.outcomes = defaultdict(lambda: deque(maxlen=self.window))  # (error, latency) of recent responses, by slot
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getint('PARLEH_MAX_CONCURRENCY_PER_DOMAIN'):
+            raise NotConfigured
+        return cls(crawler)
+
+    def process_response(self, request, response, spider=None):
+        if 'cached' not in response.flags:
+            self.record(request, response.status in BACKOFF_STATUSES,
+                        request.meta.get('download_latency'), response.headers.get('Retry-After'))
+        return response
+
+    def process_exception(self, request, exception, spider=None):
+        self.record(request, True, None, None)
+
+    def record(self, request, error, latency, retry_after):
+        key = request.meta.get('download_slot')
+        slot = self.crawler.engine.downloader.slots.get(key)
+        if slot is None:
+            return
+
+        if error:
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else max(2 * slot.delay, 1.0)
+            slot.delay = min(delay, self.max_delay)
+
+        outcomes = self.outcomes[key]
+        outcomes.append((error, latency))
+        if len(outcomes) < self.window:
+            return
+
+        error_rate = sum(error for error, _ in outcomes) / len(outcomes)
+        latencies = [latency for _, latency in outcomes if latency is not None]
+        mean_latency = sum(latencies) / len(latencies) if latencies else 0
+        if error_rate > self.max_error_rate or mean_latency > self.max_latency:
+            concurrency = max(1, slot.concurrency // 2)
+        elif error_rate == 0 and mean_latency < self.max_latency / 2:
+            concurrency = min(self.max_concurrency, slot.concurrency + 1)
+        else:
+            concurrency = slot.concurrency
+
+        outcomes.clear()
+        if concurrency != slot.concurrency:
+            self.crawler.spider.logger.info("%s: concurrency %d -> %d (error rate %.0f%%, mean latency %.2fs, delay %.2fs)",
+                               key, slot.concurrency, concurrency, 100 * error_rate, mean_latency, slot.delay)
+            slot.concurrency = concurrency
+            self.crawler.stats.set_value(f'adaptive/{key}/concurrency', concurrency)
+
+
+class ThroughputStats:
+    def __init__(self, stats, interval):
+        self.stats = stats
+        self.interval = interval
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        interval = crawler.settings.getfloat('PARLEH_THROUGHPUT_INTERVAL')
+        if not interval:
+            raise NotConfigured
+        ext = cls(crawler.stats, interval)
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.response_received, signal=signals.response_received)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def counts(self):
+        return (self.stats.get_value('response_received_count', 0), self.stats.get_value('item_scraped_count', 0),
+                self.stats.get_value('downloader/response_bytes', 0))
+
+    def spider_opened(self, spider):
+        self.start = self.last = time.monotonic()
+        self.last_counts = self.counts()
+
+    def response_received(self, spider):
+        now = time.monotonic()
+        if now - self.last >= self.interval:
+            self.log(spider, now)
+
+    def log(self, spider, now):
+        counts = self.counts()
+        pages, items, kbytes = [(c - p) / (now - self.last) for c, p in zip(counts, self.last_counts)]
+        spider.logger.info("Throughput: %.1f pages/sec, %.1f items/sec, %.0f KB/sec (%d pages, %d items, %.1f MB in total)",
+                           pages, items, kbytes / 1024, counts[0], counts[1], counts[2] / 1e6)
+        self.last, self.last_counts = now, counts
+
+    def spider_closed(self, spider, reason):
+        elapsed = time.monotonic() - self.start
+        pages, items, nbytes = self.counts()
+        if elapsed > 0:
+            self.stats.set_value('throughput/pages_per_sec', round(pages / elapsed, 2))
+            self.stats.set_value('throughput/items_per_sec', round(items / elapsed, 2))
+            self.stats.set_value('throughput/kbytes_per_sec', round(nbytes / 1024 / elapsed, 1))
+
+
+# Spider middleware recording, in the metrics registry: the latency (uncached only), status and size of each response by host,
+# and the time spent in each callback, including producing the items and requests it yields lazily, with their counts.
+class CallbackMetrics:
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls()
+
+    def process_spider_input(self, response, spider=None):
+        host = urlsplit(response.url).netloc
+        if 'cached' in response.flags:
+            metrics.inc('crawl_responses_total', host=host, status='cached')
+        else:
+            metrics.inc('crawl_responses_total', host=host, status=response.status)
+            latency = response.meta.get('download_latency')
+            if latency is not None:
+                metrics.observe('crawl_request_seconds', latency, host=host)
+        metrics.inc('crawl_response_bytes_total', len(response.body), host=host)
+        metrics.observe('crawl_response_size_bytes', len(response.body), buckets=metrics.BYTES_BUCKETS, host=host)
+
+    def process_spider_output(self, response, result, spider=None):
+        counts = CallbackCounts(callback_name(response))
+        it = iter(result)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    o = next(it)
+                except StopIteration:
+                    break
+                finally:
+                    counts.elapsed += time.perf_counter() - start
+                counts.add(o)
+                yield o
+        finally:
+            counts.record()
+
+    # (used by newer Scrapy versions, whatever the callback returns)
+    async def process_spider_output_async(self, response, result, spider=None):
+        counts = CallbackCounts(callback_name(response))
+        it = result.__aiter__()
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    o = await it.__anext__()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    counts.elapsed += time.perf_counter() - start
+                counts.add(o)
+                yield o
+        finally:
+            counts.record()
+
+
+class CallbackCounts:
+    def __init__(self, callback):
+        self.callback = callback
+        self.elapsed = 0.0
+        self.items = 0
+        self.requests = 0
+
+    def add(self, o):
+        if isinstance(o, Request):
+            self.requests += 1
+        else:
+            self.items += 1
+
+    def record(self):
+        metrics.observe('crawl_callback_seconds', self.elapsed, callback=self.callback)
+        metrics.inc('crawl_items_total', self.items, callback=self.callback)
+        metrics.inc('crawl_requests_total', self.requests, callback=self.callback)
+
+
+def callback_name(response):
+    callback = response.request.callback if response.request is not None else None
+    return getattr(callback, '__name__', 'parse')
+
+
+# Settings for a crawl keyed by `name` (spider names are not unique across the spider scripts):
+# the politeness and throughput profile above, and a job directory unless `resumable` is false or PARLEH_RESUME=off.
+def crawl_settings(name, resumable=True):
+    settings = {
+        **POLITENESS_SETTINGS,
+        'DOWNLOADER_MIDDLEWARES': {'common.crawl.AdaptiveConcurrency': 560},
+        # closest to the spider, so it times only the callbacks
+        'SPIDER_MIDDLEWARES': {'common.crawl.CallbackMetrics': 950},
+        'EXTENSIONS': {'common.crawl.ThroughputStats': 500},
+    }
+    if resumable and is_resumable():
+        settings['JOBDIR'] = job_dir(name)
+        settings['EXTENSIONS']['common.crawl.FinishedJobCleanup'] = 500
+    return settings
@@ -0,0 +1,88 @@
+# Date parsing shared by the CA pipeline and the AU/NZ spiders.
+#
+# The sources use a handful of known formats (ISO timestamps in ParlInfo JSON, "9 Nov 2020" and "8/03/2017" on the AU/NZ pages),
+# which are tried with strptime before falling back to pandas' format inference. Results are memoized by string,
+# since the same dates (sitting days, parliament start/end dates) recur throughout a crawl.
+#
+# Quirks handled:
+#   "11 Apr 2022 (after midnight)"   a sitting that ran past midnight, dated by its sitting day
+#   "c. 1850", "circa 1850", "1850?"  approximate dates, reported by parse_date_approx
+#   "1850"                           year only, as 1 January (also approximate)
+
+import re
+from datetime import date, datetime
+from functools import lru_cache
+
+ISO_RE = re.compile(r'(\d{4})-(\d{2})-(\d{2})(?:[T ][\d:.]*)?')
+YEAR_RE = re.compile(r'\d{4}')
+APPROX_RE = re.compile(r'(?:c\.|ca\.|circa|about|approx\.?)\s*', re.IGNORECASE)
+
+DAYFIRST_FORMATS = ['%d/%m/%Y', '%d %b %Y', '%d %B %Y', '%A, %d %B %Y', '%d-%m-%Y', '%d.%m.%Y']
+MONTHFIRST_FORMATS = ['%m/%d/%Y', '%b %d, %Y', '%B %d, %Y', '%d %b %Y', '%d %B %Y', '%A, %d %B %Y']
+
+
+def clean(s):
+    s = ' '.join(s.replace('\xa0', ' ').split())
+    s = s.replace('(after midnight)', '').strip()
+    approximate = False
+    m = APPROX_RE.match(s)
+    if m:
+        s, approximate = s[m.end():], True
+    if s.endswith('?'):
+        s, approximate = s[:-1].rstrip(), True
+    return s, approximate
+
+
+# Returns (date or None, whether the date is approximate) for a date string in any of the known formats.
+@lru_cache(maxsize=65536)
+def parse_date_approx(s, dayfirst=False):
+    if s is None:
+        return None, False
+    s, approximate = clean(s)
+    if not s:
+        return None, approximate
+
+    # out of range values (e.g. 2020-02-30, 1850-00-00, year 0000) are missing, as pd.to_datetime(errors='coerce') has them
+    m = ISO_RE.fullmatch(s)
+    if m:
+        try:
+            return date(*map(int, m.groups())), approximate
+        except ValueError:
+            return None, approximate
+    if YEAR_RE.fullmatch(s):
+        try:
+            return date(int(s), 1, 1), True
+        except ValueError:
+            return None, approximate
+
+    for fmt in DAYFIRST_FORMATS if dayfirst else MONTHFIRST_FORMATS:
+        try:
+            return datetime.strptime(s, fmt).date(), approximate
+        except ValueError:
+            pass
+
+    # an unknown format: let pandas infer it
+    import pandas as pd
+    ts = pd.to_datetime(s, dayfirst=dayfirst, errors='coerce')
+    return (None if pd.isna(ts) else ts.date()), approximate
+
+
+def parse_date(s, dayfirst=False):
+    return parse_date_approx(s, dayfirst)[0]
+
+
+# The date as YYYY-MM-DD, or `default` if missing or unparseable
+def iso_date(s, dayfirst=False, default=None):
+    d = parse_date(s, dayfirst)
+    return d.isoformat() if d is not None else default
+
+
+# Converts a column of date strings to dates (NaT where missing), parsing each distinct value once,
+# like pd.to_datetime(s).dt.date.
+def to_dates(s, dayfirst=False):
+    import pandas as pd
+    codes, uniques = pd.factorize(s)
+    parsed = [parse_date(v, dayfirst) if isinstance(v, str) else None for v in uniques]
+    # missing values have code -1, which picks the trailing NaT
+    values = pd.Series([pd.NaT if d is None else d for d in parsed] + [pd.NaT], dtype=object)
+    return pd.Series(values.to_numpy()[codes], index=s.index, name=s.name, dtype=object)
@@ -0,0 +1,49 @@
+# Text extraction helpers shared by the AU/NZ spiders.
+#
+# These work on the lxml elements under Scrapy selectors, joining each element's text nodes directly,
+# which gives the same result as XPath string(.) without evaluating an XPath expression per element,
+# and extract whole lists and tables in one pass. Text is normalised the same way everywhere:
+# non-breaking spaces (&nbsp;) become plain spaces, and leading/trailing whitespace is stripped.
+
+from parsel import Selector, SelectorList
+
+
+def root(el):
+    if isinstance(el, SelectorList):
+        return el[0].root if len(el) > 0 else None
+    if isinstance(el, Selector):
+        return el.root
+    return el
+
+
+def normalize(s, strip=True):
+    s = s.replace('\xa0', ' ')  # &nbsp; -> space
+    return s.strip() if strip else s
+
+
+# Text of the element (a selector, the first of a selector list, or an lxml element), or `default` if there is none.
+def text(el, strip=True, default=None):
+    el = root(el)
+    if el is None:
+        return default
+    if isinstance(el, str):  # attribute or text() selectors
+        return normalize(el, strip)
+    return normalize(''.join(el.itertext()), strip)
+
+
+# Texts of all the elements in a selector list
+def texts(els, strip=True):
+    return [text(el.root, strip, '') for el in els]
+
+
+# Cell texts of each row (tr) in a table, optionally only those in the given section (thead, tbody, tfoot),
+# with the row's class attribute: [(class, [text, ...]), ...]
+# Only td cells are taken by default, as the spiders did with tr.css('td'); pass cells=('td', 'th') to include headers.
+def table_rows(table, section=None, strip=True, cells=('td',)):
+    table = root(table)
+    rows = []
+    for tr in table.iter('tr'):
+        if section is not None and tr.getparent().tag != section:
+            continue
+        rows.append((tr.get('class'), [text(cell, strip, '') for cell in tr if cell.tag in cells]))
+    return rows
@@ -0,0 +1,201 @@
+# Persistent HTTP response cache shared by the CA ParlInfo client and the AU/NZ Scrapy spiders.
+#
+# Responses are stored in a single SQLite file, keyed by method + URL (with query parameters in canonical order),
+# with a TTL chosen per endpoint by URL pattern, and a total size cap enforced by evicting the least recently used entries.
+#
+# Environment variables:
+#   PARLEH_CACHE=off        disables the cache
+#   PARLEH_CACHE_DIR=dir    where to keep the cache (default: .cache in the repository root)
+#   PARLEH_CACHE_MAX_MB=n   size cap (default 500)
+#   PARLEH_OFFLINE=1        replay mode: serve everything from the cache regardless of age, and never touch the network
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '.cache')
+DEFAULT_MAX_MB = 500
+# once over the cap, entries are evicted until the total is this fraction of it, so eviction doesn't run on every put
+EVICT_TO = 0.9
+EVICT_BATCH = 100
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+
+class CacheMiss(Exception):
+    pass
+
+
+def is_enabled():
+    return os.environ.get('PARLEH_CACHE', 'on').lower() not in ['0', 'off', 'false', 'no']
+
+
+def is_offline():
+    return os.environ.get('PARLEH_OFFLINE', '').lower() in ['1', 'on', 'true', 'yes']
+
+
+def cache_path(name='http'):
+    return os.path.join(os.environ.get('PARLEH_CACHE_DIR', DEFAULT_CACHE_DIR), name + '.sqlite')
+
+
+def canonical_url(url, params=None):
+    scheme, netloc, path, query, _ = urlsplit(url)
+    items = parse_qsl(query, keep_blank_values=True) + sorted((params or {}).items())
+    return urlunsplit((scheme, netloc.lower(), path, urlencode(sorted(items)), ''))
+
+
+class CachedResponse:
+    def __init__(self, url, status, headers, body, stored_at):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.stored_at = stored_at
+
+
+class ResponseCache:
+    # ttls: list of (regex, seconds) pairs matched against the URL in order; seconds of None never expire
+    def __init__(self, path=None, ttls=(), default_ttl=DAY, max_bytes=None, offline=None):
+        self.path = path or cache_path()
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in ttls]
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes or int(os.environ.get('PARLEH_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024
+        self.offline = is_offline() if offline is None else offline
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('''CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY, url TEXT, status INTEGER, headers TEXT, body BLOB,
+            size INTEGER, stored_at REAL, accessed_at REAL)''')
+        self.db.execute('CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)')
+        self.db.commit()
+        # running total of the stored sizes, kept up to date by put and evict
+        # (other processes sharing the file aren't counted until it is reopened)
+        self.total = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def key(self, url, params=None, method='GET'):
+        return hashlib.sha1(f'{method} {canonical_url(url, params)}'.encode('utf8')).hexdigest()
+
+    def ttl(self, url):
+        for pattern, ttl in self.ttls:
+            if pattern.search(url):
+                return ttl
+        return self.default_ttl
+
+    # Returns the cached response, or None if missing or expired (in offline mode, expired entries are still returned).
+    def get(self, url, params=None, method='GET'):
+        key = self.key(url, params, method)
+        with self.lock:
+            row = self.db.execute('SELECT url, status, headers, body, stored_at FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            url, status, headers, body, stored_at = row
+            ttl = self.ttl(url)
+            if not self.offline and ttl is not None and time.time() - stored_at > ttl:
+                return None
+            self.db.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (time.time(), key))
+            self.db.commit()
+        return CachedResponse(url, status, decode_headers(headers), zlib.decompress(body), stored_at)
+
+    def put(self, url, status, headers, body, params=None, method='GET'):
+        key = self.key(url, params, method)
+        compressed = zlib.compress(body)
+        now = time.time()
+        with self.lock:
+            old = self.db.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self.db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                            (key, canonical_url(url, params), status, encode_headers(headers), compressed, len(compressed), now, now))
+            self.total += len(compressed) - (old[0] if old else 0)
+            self.evict()
+            self.db.commit()
+
+    # Marks a cached response as still valid, e.g. after a 304 Not Modified.
+    def touch(self, url, params=None, method='GET'):
+        now = time.time()
+        with self.lock:
+            self.db.execute('UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?',
+                            (now, now, self.key(url, params, method)))
+            self.db.commit()
+
+    # If the total size is over the cap, deletes least recently used entries until it is down to EVICT_TO of the cap.
+    # Called with the lock held.
+    def evict(self):
+        if self.total <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICT_TO
+        while self.total > target:
+            rows = self.db.execute('SELECT key, size FROM responses ORDER BY accessed_at LIMIT ?', (EVICT_BATCH,)).fetchall()
+            if not rows:
+                self.total = 0
+                break
+            for key, size in rows:
+                self.db.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self.total -= size
+                if self.total <= target:
+                    break
+
+    def close(self):
+        self.db.close()
+
+
+# headers are stored one per line as "Name: value", which keeps repeated headers (e.g. Set-Cookie)
+def encode_headers(headers):
+    return '\n'.join(f'{name}: {value}' for name, value in headers)
+
+
+def decode_headers(s):
+    return [tuple(line.split(': ', 1)) for line in s.split('\n') if line]
+
+
+# Scrapy cache storage backed by ResponseCache, with per-endpoint TTLs from the PARLEH_CACHE_TTLS setting.
+# In offline mode, HTTPCACHE_IGNORE_MISSING makes the cache middleware drop requests that were never cached.
+class ScrapyCacheStorage:
+    def __init__(self, settings):
+        self.ttls = settings.get('PARLEH_CACHE_TTLS', [])
+        self.default_ttl = settings.getint('HTTPCACHE_EXPIRATION_SECS') or None
+        self.cache = None
+
+    def open_spider(self, spider):
+        self.cache = ResponseCache(cache_path(spider.name), self.ttls, self.default_ttl)
+
+    def close_spider(self, spider):
+        self.cache.close()
+
+    def retrieve_response(self, spider, request):
+        from scrapy.http import Headers
+        from scrapy.responsetypes import responsetypes
+
+        cached = self.cache.get(request.url, method=request.method)
+        if cached is None:
+            return None
+        headers = Headers()
+        for name, value in cached.headers:
+            headers.appendlist(name, value)
+        respcls = responsetypes.from_args(headers=headers, url=request.url, body=cached.body)
+        return respcls(url=request.url, headers=headers, status=cached.status, body=cached.body)
+
+    def store_response(self, spider, request, response):
+        headers = [(name.decode('latin1'), value.decode('latin1'))
+                   for name, values in response.headers.items() for value in values]
+        self.cache.put(request.url, response.status, headers, response.body, method=request.method)
+
+
+# Scrapy settings enabling the shared cache for a spider, e.g. custom_settings = cache_settings([(r'/biography', 7 * DAY)])
+def cache_settings(ttls=(), default_ttl=DAY):
+    return {
+        'HTTPCACHE_ENABLED': is_enabled(),
+        'HTTPCACHE_STORAGE': 'common.httpcache.ScrapyCacheStorage',
+        'HTTPCACHE_POLICY': 'scrapy.extensions.httpcache.DummyPolicy',
+        'HTTPCACHE_EXPIRATION_SECS': 0 if is_offline() else default_ttl,
+        'HTTPCACHE_IGNORE_MISSING': is_offline(),
+        'HTTPCACHE_IGNORE_HTTP_CODES': [429, 500, 502, 503, 504],
+        'PARLEH_CACHE_TTLS': list(ttls),
+    }
@@ -0,0 +1,81 @@
+# Manifest of crawled pages, keyed by URL, so spiders can make conditional requests and skip re-parsing unchanged pages.
+#
+# For each URL it keeps the validators (ETag, Last-Modified) and a content hash of the last 200 response,
+# the items parsed from it, and fetch/change timestamps. Stored as JSON, written atomically when the spider closes.
+
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+
+def utc_now():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+def body_hash(body):
+    return hashlib.sha256(body).hexdigest()
+
+
+class PageManifest:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def __contains__(self, url):
+        return url in self.entries
+
+    def get(self, url):
+        return self.entries.get(url)
+
+    # Conditional request headers for the URL, if it has been fetched before
+    def request_headers(self, url):
+        entry = self.entries.get(url, {})
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('lastModified'):
+            headers['If-Modified-Since'] = entry['lastModified']
+        return headers
+
+    # The URL a response is recorded under: the URL originally requested, before any redirects (e.g. http -> https,
+    # a trailing slash), so it matches the URL passed to request_headers().
+    def url(self, response):
+        return response.meta.get('redirect_urls', [response.url])[0]
+
+    # Returns the items recorded for the response's URL if the page is unchanged (304 Not Modified, or the same content),
+    # else None, in which case the caller parses the page and calls record().
+    def unchanged_items(self, response):
+        entry = self.entries.get(self.url(response))
+        if entry is None:
+            return None
+        if response.status == 304 or entry.get('sha256') == body_hash(response.body):
+            entry['fetchedAt'] = utc_now()
+            return entry['items']
+        return None
+
+    def record(self, response, items):
+        now = utc_now()
+        self.entries[self.url(response)] = {
+            'etag': header(response, 'ETag'),
+            'lastModified': header(response, 'Last-Modified'),
+            'sha256': body_hash(response.body),
+            'fetchedAt': now,
+            'changedAt': now,
+            'items': items,
+        }
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # not sorting keys, so re-emitted items keep their field order
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(self.path + '.tmp', self.path)
+
+
+def header(response, name):
+    value = response.headers.get(name)
+    return value.decode('latin1') if value is not None else None
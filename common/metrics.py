@@ -0,0 +1,212 @@
+# In-process metrics shared by the CA scripts and the AU/NZ spiders: counters, and histograms of durations or sizes
+# (e.g. request latency, JSON decoding and parse time per callback), labelled by endpoint, stage, callback and so on.
+#
+# Recording is a dict lookup and a bisect under a lock, so instrumentation stays on all the time.
+# The report can be written as JSON (counters with their rate per second, histograms with approximate percentiles),
+# or in the Prometheus text format (for node_exporter's textfile collector) if the file name ends in .prom.
+#
+# Environment variables:
+#   PARLEH_METRICS_FILE=path   write the report to this file when the process exits
+#
+#   with metrics.timer('parleh_stage_seconds', stage='people_df'):
+#       df = ...
+#   metrics.inc('parleh_records_total', len(people), kind='people')
+#   metrics.write_report('metrics.prom')
+
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone
+
+# upper bounds of the histogram buckets, for durations in seconds
+SECONDS_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+# and for sizes in bytes
+BYTES_BUCKETS = [2 ** n for n in range(10, 28, 2)]
+
+
+def utc_now():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+def label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Histogram:
+    __slots__ = ['buckets', 'counts', 'count', 'sum']
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last for values above the largest bucket
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    # Upper bound of the bucket holding the q-th quantile (the largest bucket bound if beyond it)
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return self.buckets[-1]
+
+
+class Timer:
+    __slots__ = ['registry', 'name', 'labels', 'start', 'elapsed']
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+        self.elapsed = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        self.registry.observe(self.name, self.elapsed, **self.labels)
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}  # (name, labels): value
+        self.histograms = {}  # (name, labels): Histogram
+        self.started_at = utc_now()
+        self.start = time.monotonic()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    # Records a value in the histogram; durations by default, or pass buckets=BYTES_BUCKETS for sizes.
+    def observe(self, name, value, buckets=SECONDS_BUCKETS, **labels):
+        key = (name, label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    # Context manager recording the duration of its block in seconds
+    def timer(self, name, **labels):
+        return Timer(self, name, labels)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started_at = utc_now()
+            self.start = time.monotonic()
+
+    def report(self):
+        elapsed = time.monotonic() - self.start
+        with self.lock:
+            counters = [{
+                'name': name,
+                'labels': dict(labels),
+                'value': value,
+                'perSecond': round(value / elapsed, 3) if elapsed > 0 else None,
+            } for (name, labels), value in sorted(self.counters.items())]
+            histograms = [{
+                'name': name,
+                'labels': dict(labels),
+                'count': h.count,
+                'sum': round(h.sum, 6),
+                'mean': round(h.sum / h.count, 6) if h.count else None,
+                'p50': h.quantile(0.5),
+                'p90': h.quantile(0.9),
+                'p99': h.quantile(0.99),
+                'buckets': dict(zip([str(b) for b in h.buckets] + ['+Inf'], h.counts)),
+            } for (name, labels), h in sorted(self.histograms.items())]
+        return {
+            'startedAt': self.started_at,
+            'elapsedSeconds': round(elapsed, 3),
+            'counters': counters,
+            'histograms': histograms,
+        }
+
+    def prometheus(self):
+        lines = []
+        typed = set()
+
+        def type_line(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} {kind}')
+
+        with self.lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                type_line(name, 'counter')
+                lines.append(f'{name}{prometheus_labels(labels)} {value}')
+            for (name, labels), h in sorted(self.histograms.items()):
+                type_line(name, 'histogram')
+                cumulative = 0
+                for bound, count in zip([str(b) for b in h.buckets] + ['+Inf'], h.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{prometheus_labels(labels + (("le", bound),))} {cumulative}')
+                lines.append(f'{name}_sum{prometheus_labels(labels)} {h.sum}')
+                lines.append(f'{name}_count{prometheus_labels(labels)} {h.count}')
+        return '\n'.join(lines) + '\n'
+
+    # Writes the report atomically: Prometheus text format if the path ends in .prom, else JSON.
+    def write_report(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            if path.endswith('.prom'):
+                f.write(self.prometheus())
+            else:
+                json.dump(self.report(), f, indent=2)
+        os.replace(path + '.tmp', path)
+
+
+def prometheus_labels(labels):
+    if not labels:
+        return ''
+    escaped = [(k, v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in labels]
+    return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+
+# the process-wide registry, used through the functions below
+REGISTRY = Registry()
+
+
+def inc(name, value=1, **labels):
+    REGISTRY.inc(name, value, **labels)
+
+
+def observe(name, value, buckets=SECONDS_BUCKETS, **labels):
+    REGISTRY.observe(name, value, buckets, **labels)
+
+
+def timer(name, **labels):
+    return REGISTRY.timer(name, **labels)
+
+
+def report():
+    return REGISTRY.report()
+
+
+def write_report(path=None):
+    path = path or os.environ.get('PARLEH_METRICS_FILE')
+    if path:
+        REGISTRY.write_report(path)
+        print(f"Metrics written to {path}")
+
+
+if os.environ.get('PARLEH_METRICS_FILE'):
+    atexit.register(write_report)
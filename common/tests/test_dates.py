@@ -0,0 +1,33 @@
+import os
+import sys
+import unittest
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.dates import iso_date, parse_date, parse_date_approx
+
+# Known formats are parsed without pandas; values that aren't real dates are missing, as pd.to_datetime(errors='coerce')
+# has them.
+
+
+class ParseDateTest(unittest.TestCase):
+    def test_known_formats(self):
+        self.assertEqual(parse_date('1990-01-02T00:00:00'), date(1990, 1, 2))
+        self.assertEqual(parse_date('8/03/2017', dayfirst=True), date(2017, 3, 8))
+        self.assertEqual(parse_date('11 Apr 2022 (after midnight)', dayfirst=True), date(2022, 4, 11))
+        self.assertEqual(parse_date_approx('c. 1850'), (date(1850, 1, 1), True))
+        self.assertEqual(parse_date_approx('1850'), (date(1850, 1, 1), True))
+
+    def test_out_of_range(self):
+        for s in ['2020-02-30T00:00:00', '1850-00-00', '0000', 'c. 0000', '31/02/2017']:
+            with self.subTest(s=s):
+                self.assertIsNone(parse_date(s, dayfirst=True))
+                self.assertIsNone(iso_date(s))
+
+    def test_missing(self):
+        self.assertEqual(parse_date_approx(None), (None, False))
+        self.assertIsNone(parse_date(''))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common import unified
+
+# A fresh tree has the CA role CSVs (they are committed) but not all_parliaments.csv, which the CA people come from:
+# CA is skipped, rather than failing the build of the other countries.
+
+
+class MissingInputsTest(unittest.TestCase):
+    def test_ca_without_parliaments(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            people_dir = os.path.join(tmp, 'people')
+            os.makedirs(people_dir)
+            with open(os.path.join(people_dir, 'education.csv'), 'w') as f:
+                f.write('PersonId,LastName\n1,Smith\n')
+            missing = os.path.join(tmp, 'missing')
+            with mock.patch.multiple(unified, CA_PARLIAMENTS_FILE=os.path.join(tmp, 'all_parliaments.csv'),
+                                     CA_PEOPLE_DIR=people_dir, AU_PROFILES_FILE=missing, NZ_PROFILES_FILE=missing):
+                out = io.StringIO()
+                with contextlib.redirect_stdout(out):
+                    self.assertEqual(unified.ca_inputs(), [])
+                    self.assertEqual(unified.build(), [])
+        self.assertIn('all_parliaments.csv not found', out.getvalue())
+        self.assertIn('CA: no inputs, skipping', out.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,423 @@
+# Unified people dataset: the parliamentarians of all three countries, and their roles, in one typed schema,
+# stored as Parquet datasets partitioned by country (requires pyarrow: `pipenv install --categories optional`, imported when first needed).
+#
+# Inputs (all optional; a country whose inputs are missing is skipped):
+#   CA   ca/data/parliaments/all_parliaments.csv (download_parliaments.py), and the role CSVs in ca/data/people (extract_roles.py);
+#        the people come from all_parliaments.csv, so without it CA is skipped even though the role CSVs are committed
+#   AU   au/src/all-profiles.jl (`make all-profiles.jl` in au/src)
+#   NZ   nz/data/profiles.jl (`scrapy runspider spider-all.py -O ../data/profiles.jl` in nz/src)
+#
+# Layout under data/unified in the repository root:
+#   people/country=<CA|AU|NZ>/part-0.parquet   one row per person: PEOPLE_DTYPES
+#   roles/country=<CA|AU|NZ>/part-0.parquet    one row per role held: ROLE_DTYPES
+#   manifest.json                              a fingerprint of each country's inputs, as of its last build
+#
+# Builds are incremental: a country's partitions are only rebuilt when the content of its inputs
+# (or SCHEMA_VERSION) has changed since they were written, so refreshing one country only recomputes that country.
+#
+#   python common/unified.py [--force] [--countries CA NZ]
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from datetime import datetime, timezone
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.dates import parse_date
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+UNIFIED_DIR = os.path.join(ROOT_DIR, 'data', 'unified')
+
+# bump when the normalisation below changes, so existing partitions are rebuilt
+SCHEMA_VERSION = 1
+
+PEOPLE_DTYPES = {
+    'person_id': 'string',
+    'name': 'string',
+    'last_name': 'string',
+    'first_name': 'string',
+    'gender': 'category',
+    'party': 'category',
+    'constituency': 'string',
+    'birth_date': 'datetime64[ns]',
+    'death_date': 'datetime64[ns]',
+    'source_url': 'string',
+}
+
+ROLE_DTYPES = {
+    'person_id': 'string',
+    'role_type': 'category',
+    'title': 'string',
+    'organization': 'string',
+    'start_date': 'datetime64[ns]',
+    'end_date': 'datetime64[ns]',
+}
+
+CA_PARLIAMENTS_FILE = os.path.join(ROOT_DIR, 'ca', 'data', 'parliaments', 'all_parliaments.csv')
+CA_PEOPLE_DIR = os.path.join(ROOT_DIR, 'ca', 'data', 'people')
+# same as roles.ROLE_TYPES in ca/src
+CA_ROLE_FILES = {
+    'Education': 'education.csv',
+    'FederalExperience': 'federal_experience.csv',
+    'MilitaryExperience': 'military_experience.csv',
+    'MunicipalExperience': 'municipal_experience.csv',
+    'ProvincialExperience': 'provincial_experience.csv',
+}
+CA_PROFILE_URL = 'https://lop.parl.ca/sites/ParlInfo/default/en_CA/People/Profile?personId=%s'
+AU_PROFILES_FILE = os.path.join(ROOT_DIR, 'au', 'src', 'all-profiles.jl')
+NZ_PROFILES_FILE = os.path.join(ROOT_DIR, 'nz', 'data', 'profiles.jl')
+
+# AU biography sections listing roles, one per '||'-separated entry, e.g. "Joint Standing Committee on Electoral Matters: 2008-13."
+AU_ROLE_SECTIONS = ['Parliamentary Service', 'Ministerial Appointments', 'Committee Service', 'Parliamentary Party Positions']
+AU_ID_RE = re.compile(r'allmps%2F(\w+)', re.IGNORECASE)
+AU_HONORIFIC_RE = re.compile(r'^(?:the\s+)?(?:Rt\s+)?(?:Hon\.?\s+)?(?:(?:Dr|Sir|Dame|Mr|Mrs|Ms|Miss|Prof|AC|AO|AM)\.?\s+)*', re.IGNORECASE)
+AU_BORN_RE = re.compile(r'Born\s+(\d{1,2}\.\d{1,2}\.\d{4})')
+AU_DIED_RE = re.compile(r'Died\s+(\d{1,2}\.\d{1,2}\.\d{4})')
+# "1996-98", "2008-2013", "2004" at the end of an entry
+AU_YEARS_RE = re.compile(r'(\d{4})(?:\s*[-–]\s*(\d{2,4}))?\.?$')
+NZ_HONORIFIC_RE = re.compile(r'^(?:(?:Rt|Hon|Dr|Sir|Dame)\.?\s+)*')
+
+
+def utc_now():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+def pyarrow_parquet():
+    try:
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("The unified dataset requires pyarrow: pipenv install --categories optional") from None
+    return pyarrow.parquet
+
+
+def read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def iso(d):
+    return d.isoformat() if d is not None else None
+
+
+def year_date(year):
+    return f'{year}-01-01' if year else None
+
+
+# ---- Canada ----
+
+def ca_inputs():
+    if not os.path.exists(CA_PARLIAMENTS_FILE):
+        print(f"CA: {os.path.relpath(CA_PARLIAMENTS_FILE, ROOT_DIR)} not found (run download_parliaments.py first)")
+        return []
+    return [CA_PARLIAMENTS_FILE] + [os.path.join(CA_PEOPLE_DIR, f) for f in CA_ROLE_FILES.values() if os.path.exists(os.path.join(CA_PEOPLE_DIR, f))]
+
+
+def parliament_order(parl_id):
+    return 10 ** 6 if parl_id == 'current' else int(parl_id)
+
+
+def ca_people():
+    import pandas as pd
+    df = pd.read_csv(CA_PARLIAMENTS_FILE, dtype=str, keep_default_na=False)
+    # the details as of each person's latest parliament
+    df['order'] = df['parliament'].map(parliament_order)
+    df = df.sort_values('order').drop_duplicates('PersonId', keep='last').sort_values('PersonId', key=lambda s: s.astype(int))
+    return [{
+        'person_id': r.PersonId,
+        'name': r.StraightDisplayName,
+        'last_name': r.LastName,
+        'first_name': r.UsedFirstName,
+        'gender': r.Gender or None,
+        'party': r.PartyEn or None,
+        'constituency': r.ConstituencyEn or None,
+        'birth_date': r.DateOfBirth or None,
+        'death_date': r.DateOfDeath or None,
+        'source_url': CA_PROFILE_URL % r.PersonId,
+    } for r in df.itertuples()]
+
+
+def ca_roles():
+    import pandas as pd
+    roles = []
+    for role_type, filename in CA_ROLE_FILES.items():
+        path = os.path.join(CA_PEOPLE_DIR, filename)
+        if not os.path.exists(path):
+            continue
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        if role_type == 'Education':
+            roles += [{
+                'person_id': r.PersonId,
+                'role_type': role_type,
+                'title': r.DiplomaLongEn or r.FieldOfStudyEn or None,
+                'organization': r.SchoolNameLongEn or None,
+                'start_date': None,
+                'end_date': year_date(r.GraduationYear.split('.')[0]),
+            } for r in df.itertuples()]
+        else:
+            roles += [{
+                'person_id': r.PersonId,
+                'role_type': role_type,
+                'title': r.NameEn or None,
+                'organization': r.OrganizationLongEn or None,
+                'start_date': r.StartDate or None,
+                'end_date': r.EndDate or None,
+            } for r in df.itertuples()]
+    return roles
+
+
+def ca_load():
+    return ca_people(), ca_roles()
+
+
+# ---- Australia ----
+
+def au_inputs():
+    return [AU_PROFILES_FILE] if os.path.exists(AU_PROFILES_FILE) else []
+
+
+def au_person_id(profile):
+    m = AU_ID_RE.search(profile['url'])
+    return m.group(1) if m else profile['url']
+
+
+# "SMITH, the Hon. Anthony David Hawthorn" -> ('Smith', 'Anthony David Hawthorn')
+def au_names(title):
+    last, _, first = title.partition(',')
+    first = AU_HONORIFIC_RE.sub('', first.strip())
+    return last.strip().title(), first or None
+
+
+def au_date(profile, pattern):
+    m = pattern.search(profile.get('Personal', ''))
+    return m and iso(parse_date(m.group(1), dayfirst=True))
+
+
+def au_people_roles(profiles):
+    people, roles = [], []
+    for profile in profiles:
+        person_id = au_person_id(profile)
+        name = profile.get('title', '')
+        last_name, first_name = au_names(name)
+        people.append({
+            'person_id': person_id,
+            'name': name,
+            'last_name': last_name,
+            'first_name': first_name,
+            'gender': None,
+            'party': profile.get('Party') or profile.get('party'),
+            'constituency': profile.get('Electoral Division') or profile.get('State'),
+            'birth_date': au_date(profile, AU_BORN_RE),
+            'death_date': au_date(profile, AU_DIED_RE),
+            'source_url': profile['url'],
+        })
+        for section in AU_ROLE_SECTIONS:
+            for entry in filter(None, profile.get(section, '').split('||')):
+                roles.append(au_role(person_id, section, entry))
+    return people, roles
+
+
+def au_role(person_id, section, entry):
+    title, organization, start, end = entry.rstrip('.'), None, None, None
+    if ':' in entry:
+        title, _, years = entry.rpartition(':')
+        m = AU_YEARS_RE.search(years.strip())
+        if m:
+            start, end = m.group(1), m.group(2)
+            # "2004-07" -> 2007
+            if end and len(end) == 2:
+                end = start[:2] + end
+    return {
+        'person_id': person_id,
+        'role_type': section,
+        'title': title.strip(),
+        'organization': organization,
+        'start_date': year_date(start),
+        'end_date': year_date(end),
+    }
+
+
+def au_load():
+    return au_people_roles(read_jsonl(AU_PROFILES_FILE))
+
+
+# ---- New Zealand ----
+
+def nz_inputs():
+    return [NZ_PROFILES_FILE] if os.path.exists(NZ_PROFILES_FILE) else []
+
+
+# the profile's URL slug ('ardern-jacinda'), or for items without a URL, one made from the name
+def nz_person_id(profile):
+    if profile.get('url'):
+        return profile['url'].rstrip('/').rsplit('/', 1)[-1]
+    return re.sub(r'\W+', '-', NZ_HONORIFIC_RE.sub('', profile['name']).lower()).strip('-')
+
+
+def nz_date(s):
+    return s if s and s != 'NaT' else None
+
+
+def nz_people_roles(profiles):
+    people, roles = [], []
+    for profile in profiles:
+        person_id = nz_person_id(profile)
+        name = NZ_HONORIFIC_RE.sub('', profile['name'])
+        first_name, _, last_name = name.rpartition(' ')
+        details = profile.get('profile', {})
+        people.append({
+            'person_id': person_id,
+            'name': profile['name'],
+            'last_name': last_name,
+            'first_name': first_name or None,
+            'gender': None,
+            'party': details.get('Party'),
+            'constituency': details.get('Electorate'),
+            'birth_date': None,
+            'death_date': None,
+            'source_url': profile.get('url'),
+        })
+        roles += [{
+            'person_id': person_id,
+            'role_type': role.get('_RoleType'),
+            'title': role.get('_RoleTitle'),
+            'organization': None,
+            'start_date': nz_date(role.get('Start')),
+            'end_date': nz_date(role.get('End')),
+        } for role in profile.get('roles', [])]
+    return people, roles
+
+
+def nz_load():
+    return nz_people_roles(read_jsonl(NZ_PROFILES_FILE))
+
+
+# country: (its input files, loader returning (people, roles) as lists of dicts)
+COUNTRIES = {
+    'CA': (ca_inputs, ca_load),
+    'AU': (au_inputs, au_load),
+    'NZ': (nz_inputs, nz_load),
+}
+
+
+# ---- storage ----
+
+def with_dtypes(records, dtypes):
+    import pandas as pd
+    df = pd.DataFrame.from_records(records, columns=list(dtypes))
+    for col, dtype in dtypes.items():
+        if dtype.startswith('datetime'):
+            df[col] = pd.to_datetime(df[col], errors='coerce', format='ISO8601')
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def partition_path(table, country):
+    return os.path.join(UNIFIED_DIR, table, f'country={country}', 'part-0.parquet')
+
+
+def write_partition(df, table, country):
+    pq = pyarrow_parquet()
+    import pyarrow
+    path = partition_path(table, country)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(pyarrow.Table.from_pandas(df, preserve_index=False), path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+
+# Reads the people or roles of the given countries (default all), with a 'country' column.
+def read(table, countries=None, columns=None):
+    pq = pyarrow_parquet()
+    filters = [('country', 'in', list(countries))] if countries is not None else None
+    return pq.read_table(os.path.join(UNIFIED_DIR, table), columns=columns, filters=filters,
+                         partitioning='hive').to_pandas()
+
+
+def read_people(countries=None, columns=None):
+    return read('people', countries, columns)
+
+
+def read_roles(countries=None, columns=None):
+    return read('roles', countries, columns)
+
+
+# Hash of the schema version and the names and content of the input files
+def fingerprint(paths):
+    h = hashlib.sha256(f'schema {SCHEMA_VERSION}\n'.encode())
+    for path in sorted(paths):
+        h.update(os.path.relpath(path, ROOT_DIR).encode() + b'\n')
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+class BuildManifest:
+    def __init__(self, path=os.path.join(UNIFIED_DIR, 'manifest.json')):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def is_current(self, country, fingerprint):
+        entry = self.entries.get(country)
+        return (entry is not None and entry['fingerprint'] == fingerprint
+                and all(os.path.exists(partition_path(table, country)) for table in ['people', 'roles']))
+
+    def record(self, country, fingerprint, inputs, num_people, num_roles):
+        self.entries[country] = {
+            'fingerprint': fingerprint,
+            'inputs': [os.path.relpath(path, ROOT_DIR) for path in inputs],
+            'builtAt': utc_now(),
+            'people': num_people,
+            'roles': num_roles,
+        }
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(self.path + '.tmp', self.path)
+
+
+# Rebuilds the partitions of the given countries (default all) whose inputs changed since the last build,
+# or all of them if forced; returns the countries rebuilt.
+def build(countries=None, force=False):
+    manifest = BuildManifest()
+    rebuilt = []
+    for country in countries or COUNTRIES:
+        inputs, load = COUNTRIES[country]
+        paths = inputs()
+        if not paths:
+            print(f"{country}: no inputs, skipping")
+            continue
+        fp = fingerprint(paths)
+        if not force and manifest.is_current(country, fp):
+            print(f"{country}: inputs unchanged, keeping existing partitions")
+            continue
+        print(f"{country}: building from {', '.join(os.path.relpath(p, ROOT_DIR) for p in paths)}...")
+        people, roles = load()
+        write_partition(with_dtypes(people, PEOPLE_DTYPES), 'people', country)
+        write_partition(with_dtypes(roles, ROLE_DTYPES), 'roles', country)
+        manifest.record(country, fp, paths, len(people), len(roles))
+        manifest.save()
+        print(f"  {len(people)} people, {len(roles)} roles")
+        rebuilt.append(country)
+    return rebuilt
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the unified people and roles datasets (data/unified) from the CA, AU and NZ outputs.')
+    parser.add_argument('--countries', nargs='+', choices=list(COUNTRIES), help='only these countries (default: all)')
+    parser.add_argument('--force', action='store_true', help='rebuild even if the inputs are unchanged')
+    args = parser.parse_args()
+    rebuilt = build(args.countries, args.force)
+    print(f"Rebuilt: {', '.join(rebuilt) or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,29 +1,72 @@
-import pandas as pd
+import os
 import scrapy
+import sys
 from urllib.parse import urlsplit, urlunsplit
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.crawl import crawl_settings
+from common.dates import iso_date
+from common.extract import table_rows, text
+from common.httpcache import DAY, cache_settings
+from common.manifest import PageManifest
+
 NZ_PARL_URL = 'https://www.parliament.nz'
 CURRENT_MPS_URL = NZ_PARL_URL + '/en/mps-and-electorates/members-of-parliament'
 FORMER_MPS_URL = NZ_PARL_URL + '/en/mps-and-electorates/former-members-of-parliament'
+# validators, content hash and parsed item of each profile, keyed by profile URL
+MANIFEST_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'profiles-manifest.json')
 
 
-def text(el, strip=True):
-    s = el.xpath('string(.)').get()
-    if s is None:
-        return ''
-    s = s.replace('\xa0', ' ')  # &nbsp; -> space
-    return s.strip() if strip else s
-
 
+# Crawls current and former MPs. Profiles are requested conditionally (If-None-Match / If-Modified-Since),
+# and those that are unchanged since the last run (304, or the same content) are re-emitted from the manifest
+# without parsing, so a full refresh mostly costs the listing pages.
 class Spider(scrapy.Spider):
     name = 'nz-mps'
-    start_urls = [CURRENT_MPS_URL]
+    start_urls = [CURRENT_MPS_URL, FORMER_MPS_URL]
+    custom_settings = {
+        **cache_settings([(r'members-of-parliament/\w', 7 * DAY)]),
+        **crawl_settings('nz-all'),
+        # a cached 304 would hide the profile from a later run without the manifest
+        'HTTPCACHE_IGNORE_HTTP_CODES': [304, 429, 500, 502, 503, 504],
+    }
+
+    def __init__(self, manifest=MANIFEST_FILE, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.manifest = PageManifest(manifest)
+
+    def closed(self, reason):
+        self.manifest.save()
 
     def parse(self, response):
         self.logger.info(f"Parsing start page at: {response.url}")
 
         for a in response.css('td a'):
-            yield response.follow(a.attrib['href'], self.parse_profile)
+            url = response.urljoin(a.attrib['href'])
+            yield scrapy.Request(url, self.parse_profile_page, headers=self.manifest.request_headers(url),
+                                 meta={'handle_httpstatus_list': [304]})
+
+        # former MPs are listed over several pages
+        for a in response.css('.pagination a, .paging a'):
+            if a.attrib.get('rel') == 'next' or text(a).lower().startswith('next'):
+                yield response.follow(a.attrib['href'], self.parse)
+
+    def parse_profile_page(self, response):
+        items = self.manifest.unchanged_items(response)
+        if items is not None:
+            self.logger.debug(f"Unchanged profile at: {response.url}")
+            self.crawler.stats.inc_value('manifest/unchanged')
+            yield from items
+            return
+        if response.status == 304:
+            # not in the manifest (e.g. it was deleted during the crawl), so fetch it in full, from the URL first requested
+            yield response.request.replace(url=self.manifest.url(response), headers={}, dont_filter=True, meta={})
+            return
+
+        items = list(self.parse_profile(response))
+        self.manifest.record(response, items)
+        self.crawler.stats.inc_value('manifest/changed')
+        yield from items
 
     # def parse(self, response):
     #     yield from self.parse_profile(response)
@@ -34,8 +77,9 @@ class Spider(scrapy.Spider):
         main = response.css('.main')[0]
         cf = main.css('.cf')[0]
         profile = {
-            'name': text(main.css('h1')),
-            'title': text(cf.css('h2')),
+            'url': response.url,
+            'name': text(main.css('h1'), default=''),
+            'title': text(cf.css('h2'), default=''),
             'profile': {},
         }
 
@@ -60,9 +104,8 @@ class Spider(scrapy.Spider):
 
     def parse_roles(self, table):
         rows = []
-        headings = [text(td) for td in table.css('thead td')]
-        for tr in table.css('tbody tr'):
-            values = [text(td) for td in tr.css('td')]
+        headings = [cell for _, cells in table_rows(table, 'thead') for cell in cells]
+        for _, values in table_rows(table, 'tbody'):
             row = {}
             for key, val in zip(headings, values):
                 if key == headings[0]:
@@ -73,6 +116,7 @@ class Spider(scrapy.Spider):
                 row[key] = val
             for key in ['Start', 'End']:
                 if key in row:
-                    row[key] = str(pd.to_datetime(row[key], dayfirst=True).date())
+                    # 'NaT' for a blank date (e.g. a current role's End), as pandas formatted it
+                    row[key] = iso_date(row[key], dayfirst=True, default='NaT')
             rows.append(row)
         return rows